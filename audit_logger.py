@@ -0,0 +1,193 @@
+# Background audit logger. Rows are queued on the request path and written in
+# batches by a worker thread, so users never wait on the BigQuery round trip.
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+
+import telemetry
+from classification_cache import CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+FLUSH_INTERVAL_SECONDS = 2.0
+MAX_RETRIES = 5
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 30.0
+JOURNAL_PATH = os.path.join(CACHE_DIR, "audit_journal.jsonl")
+
+
+class PermanentSinkError(Exception):
+    # Raised for rejections that retrying cannot fix, e.g. schema mismatches.
+    pass
+
+
+class BigQuerySink:
+    # Works with bigquery.Client and with local_backends.LocalBigQueryClient.
+    # ignore_unknown_values lets rows carry fields the table does not have yet
+    # (e.g. a newly added column) instead of having them rejected.
+    def __init__(self, client, table_id, ignore_unknown_values=False):
+        self.client = client
+        self.table_id = table_id
+        self.ignore_unknown_values = ignore_unknown_values
+
+    def write(self, rows):
+        with telemetry.span("bigquery_insert"):
+            errors = self.client.insert_rows_json(
+                self.table_id, rows, ignore_unknown_values=self.ignore_unknown_values
+            )
+        if errors:
+            raise PermanentSinkError(f"Rows rejected by {self.table_id}: {errors}")
+
+
+class MemorySink:
+    def __init__(self):
+        self.rows = []
+
+    def write(self, rows):
+        self.rows.extend(rows)
+
+
+class AuditLogger:
+    def __init__(self, sink, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL_SECONDS,
+                 max_retries=MAX_RETRIES, journal_path=JOURNAL_PATH):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.journal_path = journal_path
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+        self._journal_lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name="audit-logger", daemon=True)
+        self._worker.start()
+        atexit.register(self.close)
+
+    def log(self, row):
+        self._queue.put(row)
+
+    def flush(self, timeout=None):
+        # Blocks until every row queued so far has been written or journaled.
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self, timeout=30.0):
+        if self._stop.is_set():
+            return
+        self.flush(timeout)
+        self._stop.set()
+        self._worker.join(timeout)
+        # Rows still queued when the flush timed out (e.g. the sink is down)
+        # would be lost with the process, so they go to the journal.
+        rows = []
+        while True:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if not rows:
+            return
+        try:
+            self._journal(rows)
+        except Exception:
+            logger.exception("Dropping %d audit rows that could not be journaled", len(rows))
+        finally:
+            for _ in rows:
+                self._queue.task_done()
+
+    def _run(self):
+        # Nothing a batch does may end the worker, and every row is marked done,
+        # so flush() and close() return however the batch went.
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if not batch:
+                continue
+            try:
+                self._write(batch)
+            except Exception:
+                logger.exception("Audit batch failed, journaling %d rows", len(batch))
+                try:
+                    self._journal(batch)
+                except Exception:
+                    logger.exception("Dropping %d audit rows that could not be journaled", len(batch))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _next_batch(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, rows):
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.sink.write(rows)
+            except PermanentSinkError as e:
+                logger.error("Dropping %d audit rows: %s", len(rows), e)
+                return
+            except Exception as e:
+                # Full jitter keeps concurrent replicas from retrying in lockstep.
+                # close() cuts the wait short and ends the retries.
+                delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt)
+                if attempt < self.max_retries and not self._stop.wait(random.uniform(0, delay)):
+                    continue
+                logger.warning("Audit sink unavailable, journaling %d rows: %s", len(rows), e)
+                self._journal(rows)
+                return
+            # The rows are written; a failed replay must not write them again.
+            try:
+                self._replay_journal()
+            except Exception:
+                logger.exception("Replaying the audit journal failed")
+            return
+
+    def _journal(self, rows):
+        with self._journal_lock:
+            os.makedirs(os.path.dirname(self.journal_path) or ".", exist_ok=True)
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps(row, default=str) + "\n")
+
+    def _replay_journal(self):
+        # The sink just accepted a batch, so retry anything spilled while it was down.
+        with self._journal_lock:
+            if not os.path.exists(self.journal_path):
+                return
+            rows = []
+            with open(self.journal_path, encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        rows.append(json.loads(line))
+                    except ValueError:
+                        # e.g. a line cut short by a crash while journaling.
+                        logger.error("Dropping unreadable journaled audit row: %r", line[:200])
+            os.remove(self.journal_path)
+        for start in range(0, len(rows), self.batch_size):
+            batch = rows[start:start + self.batch_size]
+            try:
+                self.sink.write(batch)
+            except PermanentSinkError as e:
+                logger.error("Dropping %d journaled audit rows: %s", len(batch), e)
+            except Exception:
+                self._journal(rows[start:])
+                return
@@ -0,0 +1,101 @@
+# Per-turn prompt size and latency over a long chat, sending the whole history
+# (as chatbot.py used to) against the bounded ConversationContext. The local
+# model takes time in proportion to the prompt it is sent, like a real one.
+#
+#   python benchmarks/chat_context.py --turns 200
+#
+# Exits non-zero when the bounded context's last turns cost noticeably more
+# than its first full-context turns.
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PROJECT = "benchmark"
+REPLY = "Here is a detailed answer about the requested NDMO dataset. " * 8
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--seconds-per-1k-tokens", type=float, default=0.005)
+    parser.add_argument("--max-growth", type=float, default=1.25,
+                        help="allowed ratio of late to early turn latency with the bounded context")
+    args = parser.parse_args()
+
+    import clients
+    import conversation_context
+    from conversation_context import ConversationContext, format_turns
+    from local_backends import LocalGenAIClient, count_tokens
+    from model_gateway import MAX_CONNECTIONS, get_gateway
+    from model_scheduler import ModelScheduler
+
+    prompt_tokens = []
+
+    def respond(model, contents, config):
+        tokens = count_tokens(str(contents) + str(getattr(config, "system_instruction", None) or ""))
+        time.sleep(tokens / 1000 * args.seconds_per_1k_tokens)
+        if model == "summary":
+            return "Summary: the user asked about NDMO datasets and got detailed answers. " * 4
+        prompt_tokens.append(tokens)
+        return REPLY
+
+    clients.shared(("genai", PROJECT, "global", None, MAX_CONNECTIONS), lambda: LocalGenAIClient(respond))
+    # No quota in the way of the measurement.
+    for model in ("chat", "summary"):
+        clients.shared(("model_scheduler", PROJECT, model), lambda: ModelScheduler(rpm=10 ** 9, tpm=10 ** 12))
+    gateway = get_gateway(PROJECT)
+
+    def summarize(summary, turns, max_tokens):
+        return gateway.generate("summary", [summary + format_turns(turns)]).text
+
+    def question(turn):
+        return f"Question {turn}: which columns of the hospital dataset are sensitive, and why? " * 3
+
+    def run(bounded):
+        prompt_tokens.clear()
+        latencies = []
+        history = []
+        context = ConversationContext(summarize)
+        for turn in range(args.turns):
+            start = time.perf_counter()
+            if bounded:
+                context.add("user", question(turn))
+                config = type("Config", (), {"system_instruction": context.system_instruction()})()
+                reply = "".join(chunk.text for chunk in gateway.generate_stream("chat", context.contents(), config))
+                context.add("model", reply)
+                context.compact()
+            else:
+                history.append({"role": "user", "parts": [{"text": question(turn)}]})
+                reply = "".join(chunk.text for chunk in gateway.generate_stream("chat", history))
+                history.append({"role": "model", "parts": [{"text": reply}]})
+            latencies.append(time.perf_counter() - start)
+        return list(prompt_tokens), latencies
+
+    window = max(1, args.turns // 10)
+    results = {}
+    for name, bounded in (("full history", False), ("bounded context", True)):
+        tokens, latencies = run(bounded)
+        results[name] = latencies
+        print(f"{name}: prompt tokens turn 1 {tokens[0]:,}, turn {args.turns} {tokens[-1]:,}; "
+              f"median latency first {window} turns {statistics.median(latencies[:window]) * 1000:.1f} ms, "
+              f"last {window} turns {statistics.median(latencies[-window:]) * 1000:.1f} ms")
+
+    print(f"budget: {conversation_context.RECENT_TURNS} recent messages, "
+          f"{conversation_context.CONTEXT_TOKEN_BUDGET} tokens")
+    # Once the context is full, turns should cost the same from then on.
+    latencies = results["bounded context"]
+    full_at = conversation_context.RECENT_TURNS
+    early = statistics.median(latencies[full_at:full_at + window])
+    late = statistics.median(latencies[-window:])
+    if late > early * args.max_growth:
+        print(f"FAIL: bounded turns grew from {early * 1000:.1f} ms to {late * 1000:.1f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
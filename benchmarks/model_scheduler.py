@@ -0,0 +1,111 @@
+# Overload test for the Gemini scheduler against a local endpoint that enforces
+# a requests/min quota and answers 429 beyond it. Interactive and batch callers
+# hammer the gateway for --seconds; the run reports goodput against the quota,
+# how often the endpoint throttled, and admission wait by priority.
+#
+#   python benchmarks/model_scheduler.py
+#   python benchmarks/model_scheduler.py --unscheduled   # same load, straight to the client
+#
+# Exits non-zero when goodput is below --min-goodput of the quota or interactive
+# calls wait longer than batch ones.
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PROJECT = "benchmark"
+MODEL = "gemini-2.5-pro"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rpm", type=int, default=1200)
+    parser.add_argument("--tpm", type=int, default=2_000_000)
+    parser.add_argument("--window", type=float, default=3.0,
+                        help="quota window of the fake endpoint, in seconds (60 for a real per-minute quota)")
+    parser.add_argument("--seconds", type=float, default=15.0)
+    parser.add_argument("--interactive", type=int, default=2, help="interactive callers")
+    parser.add_argument("--batch", type=int, default=32, help="batch callers")
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--min-goodput", type=float, default=0.9)
+    parser.add_argument("--unscheduled", action="store_true")
+    args = parser.parse_args()
+
+    import clients
+    import telemetry
+    from local_backends import LocalGenAIClient, LocalQuota
+    from model_gateway import MAX_CONNECTIONS, get_gateway
+    from model_scheduler import BATCH, INTERACTIVE, ModelScheduler, priority
+
+    quota = LocalQuota(rpm=args.rpm, tpm=args.tpm, window=args.window)
+    client = clients.shared(
+        ("genai", PROJECT, "global", None, MAX_CONNECTIONS),
+        lambda: LocalGenAIClient(lambda model, contents, config: '{"ok": true}', args.latency, quota=quota),
+    )
+    scheduler = clients.shared(("model_scheduler", PROJECT, MODEL),
+                               lambda: ModelScheduler(rpm=args.rpm, tpm=args.tpm))
+    gateway = get_gateway(PROJECT)
+
+    deadline = time.monotonic() + args.seconds
+    lock = threading.Lock()
+    completed = {INTERACTIVE: [], BATCH: []}
+    failed = {INTERACTIVE: 0, BATCH: 0}
+
+    def caller(level):
+        with priority(level):
+            while time.monotonic() < deadline:
+                start = time.monotonic()
+                try:
+                    if args.unscheduled:
+                        client.models.generate_content(model=MODEL, contents=["ping"])
+                    else:
+                        gateway.generate(MODEL, ["ping"])
+                except Exception:
+                    with lock:
+                        failed[level] += 1
+                    continue
+                end = time.monotonic()
+                if end <= deadline:
+                    with lock:
+                        completed[level].append(end - start)
+
+    threads = [threading.Thread(target=caller, args=(INTERACTIVE,)) for _ in range(args.interactive)]
+    threads += [threading.Thread(target=caller, args=(BATCH,)) for _ in range(args.batch)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    quota_calls = args.rpm * args.seconds / 60
+    goodput = sum(len(latencies) for latencies in completed.values())
+    print(f"{'unscheduled' if args.unscheduled else 'scheduled'}: {goodput} calls succeeded in "
+          f"{args.seconds:.0f}s against a quota of {quota_calls:.0f} ({goodput / quota_calls:.0%})")
+    print(f"endpoint: {quota.admitted} admitted, {quota.rejected} throttled")
+    for level, name in ((INTERACTIVE, "interactive"), (BATCH, "batch")):
+        latencies = completed[level]
+        median = statistics.median(latencies) if latencies else float("nan")
+        print(f"{name}: {len(latencies)} succeeded, {failed[level]} failed, median latency {median:.2f}s")
+    if not args.unscheduled:
+        _, counters = telemetry.metrics.snapshot()
+        print(f"retries: {counters.get('gemini_retries', 0)}, final concurrency limit: {scheduler.stats()['limit']:.1f}")
+
+    failures = []
+    if not args.unscheduled:
+        if goodput < args.min_goodput * quota_calls:
+            failures.append(f"goodput {goodput} is below {args.min_goodput:.0%} of the quota")
+        if completed[INTERACTIVE] and completed[BATCH] and (
+            statistics.median(completed[INTERACTIVE]) > statistics.median(completed[BATCH])
+        ):
+            failures.append("interactive calls waited longer than batch calls")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+# End-to-end benchmark of the portal request path against local stand-ins for
+# GCS, BigQuery and Gemini with injected latency. Reports per-stage latency and
+# peak memory for each dataset size and compares them with a stored baseline.
+#
+#   python benchmarks/pipeline.py --rows 100 10000 1000000 --save-baseline
+#   python benchmarks/pipeline.py --rows 100 10000 1000000
+#
+# The second command exits non-zero when a stage is slower or uses more memory
+# than the baseline by more than --threshold, or when there is no baseline.
+# pipeline_baseline.json holds a reference run with the default sizes. Each run
+# happens in a fresh subprocess with its own cache directory, so every stage
+# starts cold.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "pipeline_baseline.json")
+BUCKET = "ndmo-data"
+BLOB = "Bank"
+QUERY = "I need the banking transactions data"
+
+STAGES = [
+    "detect_category",
+    "fetch_data_from_gcs",
+    "classify_rows",
+    "classification validation",
+    "classify_dataset",
+    "safe export",
+    "log_request_to_bigquery",
+    "audit flush",
+]
+
+# Differences below these are noise, whatever the relative change.
+MIN_REGRESSION_SECONDS = 0.005
+MIN_REGRESSION_MB = 5.0
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        import resource
+        # Peak rather than current RSS where /proc is unavailable.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class StageRecorder:
+    # Times stages and samples RSS in the background; a stage's peak_mb is the
+    # largest RSS growth seen while it ran. Stages may nest.
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.results = {}
+        self._active = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self._observe()
+
+    def _observe(self):
+        current = rss_mb()
+        with self._lock:
+            for stage in self._active.values():
+                stage["peak"] = max(stage["peak"], current)
+
+    @contextmanager
+    def measure(self, name):
+        start_rss = rss_mb()
+        with self._lock:
+            self._active[name] = {"peak": start_rss}
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self._observe()
+            with self._lock:
+                peak = self._active.pop(name)["peak"]
+            self.results[name] = {"seconds": seconds, "peak_mb": peak - start_rss}
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_child(root, gcs_latency, bq_latency, model_latency):
+    # The cache directory is read at import time, so it is set before the app
+    # imports; a new one per run keeps repeats cold.
+    os.environ["NDMO_CACHE_DIR"] = tempfile.mkdtemp(prefix="cache-", dir=root)
+
+    import pandas as pd
+
+    import clients
+    import ndmo_service as service
+    from audit_logger import AuditLogger, BigQuerySink
+    from dataset_catalog import DatasetCatalog
+    from local_backends import LocalBigQueryClient, LocalGenAIClient, LocalStorageClient
+    from model_gateway import MAX_CONNECTIONS
+    from ndmo_rules import classify_with_rules
+    from safe_export import EXPORT_CHUNK_ROWS, SafeExport
+
+    # The fake model answers with what the rules engine says about the same data.
+    source = pd.read_csv(os.path.join(root, BUCKET, BLOB))
+    response_text = classify_with_rules(source)[0].model_dump_json()
+    del source
+
+    project = service.GCP_PROJECT_ID
+    clients.shared(("storage", project, None), lambda: LocalStorageClient(root, gcs_latency))
+    clients.shared(("bigquery", project, None), lambda: LocalBigQueryClient(latency=bq_latency))
+    clients.shared(
+        ("genai", project, "global", None, MAX_CONNECTIONS),
+        lambda: LocalGenAIClient(lambda model, contents, config: response_text, model_latency),
+    )
+    clients.shared(
+        "audit_logger",
+        lambda: AuditLogger(BigQuerySink(service.get_bigquery_client(), service.BQ_TABLE_ID), flush_interval=0.01),
+    )
+    # Refreshed synchronously and never started, so no warm-up runs behind the stages.
+    catalog = DatasetCatalog(lambda: service.get_storage_client().bucket(BUCKET))
+    catalog.refresh()
+    clients.shared("dataset_catalog", lambda: catalog)
+
+    # Import the SDK types up front so the first model call is not charged for them.
+    from google.genai import types  # noqa: F401
+
+    recorder = StageRecorder()
+    validate = service.validate_classification
+
+    def timed_validate(text, schema):
+        with recorder.measure("classification validation"):
+            return validate(text, schema)
+
+    service.validate_classification = timed_validate
+
+    with recorder.measure("detect_category"):
+        category = service.detect_category(QUERY)
+    with recorder.measure("fetch_data_from_gcs"):
+        df, status = service.fetch_data_from_gcs(category)
+    if df is None:
+        raise SystemExit(status)
+    # The rows-mode model call, including sampling and serializing the rows.
+    with recorder.measure("classify_rows"):
+        result = service.classify_rows(df)
+    with recorder.measure("classify_dataset"):
+        service.classify_dataset(df)
+    # The download as the app builds it, from the local Arrow copy in chunks.
+    with recorder.measure("safe export"):
+        generation = df.attrs["generation"]
+        export = SafeExport(
+            lambda: service.get_dataset_cache().iter_batches(BUCKET, BLOB, generation, EXPORT_CHUNK_ROWS),
+            service.safe_transform(result, df),
+        )
+        with export.open("csv.gz") as data:
+            data.read()
+    with recorder.measure("log_request_to_bigquery"):
+        service.log_request_to_bigquery(1, service.DEFAULT_REQUESTER_ID, result.classification,
+                                        result.justification, category)
+    with recorder.measure("audit flush"):
+        service.get_audit_logger().flush(timeout=30)
+    recorder.close()
+
+    results = recorder.results
+    # Validation runs inside classify_rows; report the model call without it.
+    results["classify_rows"]["seconds"] -= results["classification validation"]["seconds"]
+    return results
+
+
+def build_dataset(root, rows):
+    from synthetic_data import generate
+    os.makedirs(os.path.join(root, BUCKET), exist_ok=True)
+    path = os.path.join(root, BUCKET, BLOB)
+    generate("bank", rows, path, seed=0, today="2025-01-01")
+    return os.path.getsize(path)
+
+
+def measure(rows, args):
+    runs = []
+    with tempfile.TemporaryDirectory() as root:
+        build_dataset(root, rows)
+        for _ in range(args.repeat):
+            output = subprocess.check_output([
+                sys.executable, __file__, "--child", root,
+                "--gcs-latency", str(args.gcs_latency),
+                "--bq-latency", str(args.bq_latency),
+                "--model-latency", str(args.model_latency),
+            ])
+            runs.append(json.loads(output))
+    # Median over repeats for each stage and metric.
+    return {
+        stage: {
+            metric: statistics.median(run[stage][metric] for run in runs)
+            for metric in ("seconds", "peak_mb")
+        }
+        for stage in STAGES
+    }
+
+
+def regressions(results, baseline, threshold):
+    found = []
+    for rows, stages in results.items():
+        for stage, current in stages.items():
+            previous = baseline.get(rows, {}).get(stage)
+            if previous is None:
+                continue
+            for metric, floor in (("seconds", MIN_REGRESSION_SECONDS), ("peak_mb", MIN_REGRESSION_MB)):
+                before, after = previous[metric], current[metric]
+                if after - before > floor and after > before * (1 + threshold):
+                    found.append(f"{rows} rows, {stage}: {metric} {before:.3f} -> {after:.3f}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--gcs-latency", type=float, default=0.05)
+    parser.add_argument("--bq-latency", type=float, default=0.05)
+    parser.add_argument("--model-latency", type=float, default=2.0)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed relative increase over the baseline")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--child")
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args.gcs_latency, args.bq_latency, args.model_latency)))
+        return
+
+    results = {}
+    for rows in args.rows:
+        results[str(rows)] = measure(rows, args)
+        print(f"\n{rows} rows")
+        print(f"  {'stage':<34} {'seconds':>9} {'peak MB':>9}")
+        for stage, values in results[str(rows)].items():
+            print(f"  {stage:<34} {values['seconds']:>9.3f} {values['peak_mb']:>9.1f}")
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2)
+            f.write("\n")
+        print(f"\nBaseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline first.")
+        sys.exit(1)
+    with open(args.baseline) as f:
+        found = regressions(results, json.load(f), args.threshold)
+    if found:
+        print("\nRegressions:")
+        for line in found:
+            print(f"  {line}")
+        sys.exit(1)
+    print("\nNo regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
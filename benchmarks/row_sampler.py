@@ -0,0 +1,76 @@
+# Prompt size, sampling time and coverage of the row sampler as datasets grow.
+# For each dataset and size it reports the tokens of the full rows against the
+# sample, the share of strata (categorical values, null patterns, numeric
+# extremes) the sample covers, and whether the rules engine classifies the
+# sample like the full data.
+#
+#   python benchmarks/row_sampler.py --rows 1000 100000 1000000
+#
+# Exits non-zero when a sample exceeds the budget, misses a stratum or is
+# classified differently.
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--datasets", nargs="+", default=["bank", "hospital", "smart city"])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--budget", type=int, default=None, help="token budget (default ROW_TOKEN_BUDGET)")
+    args = parser.parse_args()
+
+    import pandas as pd
+
+    from model_scheduler import CHARS_PER_TOKEN
+    from ndmo_rules import classify_with_rules
+    from row_sampler import ROW_TOKEN_BUDGET, row_tokens, sample_rows, strata
+    from synthetic_data import generate
+
+    budget = args.budget or ROW_TOKEN_BUDGET
+    failures = []
+    print(f"{'dataset':<12}{'rows':>10}{'full tokens':>14}{'sample rows':>13}{'sample tokens':>15}"
+          f"{'sample s':>10}{'strata':>10}  same classification")
+    with tempfile.TemporaryDirectory() as root:
+        for dataset in args.datasets:
+            for rows in args.rows:
+                path = os.path.join(root, "data.csv")
+                generate(dataset, rows, path, seed=0, today="2025-01-01")
+                df = pd.read_csv(path)
+
+                full_tokens = len(df.to_json(orient="records", date_format="iso")) // CHARS_PER_TOKEN
+                start = time.perf_counter()
+                sample = sample_rows(df, budget)
+                seconds = time.perf_counter() - start
+                sample_tokens = int(row_tokens(sample).sum())
+
+                _, covered = strata(df)
+                everything = set().union(*covered)
+                # Any sampled row counts for the strata it holds, candidate or not.
+                _, sample_covered = strata(sample)
+                seen = set().union(*sample_covered) & everything
+
+                full, part = classify_with_rules(df)[0], classify_with_rules(sample)[0]
+                same = (full.classification, full.excluded_columns) == (part.classification, part.excluded_columns)
+                print(f"{dataset:<12}{rows:>10,}{full_tokens:>14,}{len(sample):>13,}{sample_tokens:>15,}"
+                      f"{seconds:>10.3f}{len(seen):>5}/{len(everything):<4}  {same}")
+
+                if sample_tokens > budget:
+                    failures.append(f"{dataset} {rows}: sample of {sample_tokens} tokens is over the budget")
+                if seen != everything:
+                    failures.append(f"{dataset} {rows}: {len(everything - seen)} strata missing from the sample")
+                if not same:
+                    failures.append(f"{dataset} {rows}: sample classified differently")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
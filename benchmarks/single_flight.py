@@ -0,0 +1,140 @@
+# Fires concurrent requests for the same dataset against local stand-ins for GCS
+# and Gemini, and checks that they share one download and one model call, and
+# that a failing model call reaches every waiter.
+#
+#   python benchmarks/single_flight.py --sessions 16
+#
+# Exits non-zero when any request downloaded or classified on its own.
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BUCKET = "ndmo-data"
+BLOB = "Bank"
+CATEGORY = "Bank"
+
+
+def run_sessions(service, sessions):
+    barrier = threading.Barrier(sessions)
+    outcomes = [None] * sessions
+
+    def session(index):
+        barrier.wait()
+        try:
+            outcomes[index] = service.fetch_and_classify(CATEGORY)
+        except Exception as e:
+            outcomes[index] = e
+
+    threads = [threading.Thread(target=session, args=(index,)) for index in range(sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outcomes, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=16)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--gcs-latency", type=float, default=0.2)
+    parser.add_argument("--model-latency", type=float, default=1.0)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="single-flight-")
+    # The cache directory is read at import time.
+    os.environ["NDMO_CACHE_DIR"] = os.path.join(root, "cache")
+
+    import pandas as pd
+
+    import clients
+    import ndmo_service as service
+    import telemetry
+    from dataset_catalog import DatasetCatalog
+    from local_backends import LocalGenAIClient, LocalStorageClient, LocalBlob
+    from model_gateway import MAX_CONNECTIONS
+    from ndmo_rules import classify_with_rules
+    from synthetic_data import generate
+
+    os.makedirs(os.path.join(root, BUCKET))
+    generate("bank", args.rows, os.path.join(root, BUCKET, BLOB), seed=0, today="2025-01-01")
+
+    # The rules would settle a known schema locally; every request must ask the model here.
+    service.RULES_CONFIDENCE_THRESHOLD = 1.1
+    metadata = classify_with_rules(pd.read_csv(os.path.join(root, BUCKET, BLOB)))[0]
+    response_text = metadata.model_dump_json()
+    calls = {"model": 0, "download": 0}
+    fail = threading.Event()
+    lock = threading.Lock()
+
+    def respond(model, contents, config):
+        with lock:
+            calls["model"] += 1
+        if fail.is_set():
+            raise RuntimeError("model unavailable")
+        return response_text
+
+    download = LocalBlob.download_as_bytes
+
+    def counted_download(blob):
+        with lock:
+            calls["download"] += 1
+        return download(blob)
+
+    LocalBlob.download_as_bytes = counted_download
+
+    project = service.GCP_PROJECT_ID
+    clients.shared(("storage", project, None), lambda: LocalStorageClient(root, args.gcs_latency))
+    clients.shared(
+        ("genai", project, "global", None, MAX_CONNECTIONS),
+        lambda: LocalGenAIClient(respond, args.model_latency),
+    )
+    catalog = DatasetCatalog(lambda: service.get_storage_client().bucket(BUCKET))
+    catalog.refresh()
+    clients.shared("dataset_catalog", lambda: catalog)
+
+    failures = []
+
+    outcomes, seconds = run_sessions(service, args.sessions)
+    classifications = {
+        outcome[0].classification if isinstance(outcome, tuple) and outcome[0] else None for outcome in outcomes
+    }
+    print(f"{args.sessions} sessions in {seconds:.2f}s: {calls['download']} download(s), "
+          f"{calls['model']} model call(s), results {sorted(map(str, classifications))}")
+    if calls["download"] != 1 or calls["model"] != 1:
+        failures.append("concurrent requests were not coalesced")
+    if None in classifications or len(classifications) != 1:
+        failures.append("sessions did not all get the same classification")
+
+    # A new version of the dataset, and a model that fails: every session must
+    # see the failure, from a single attempt.
+    os.utime(os.path.join(root, BUCKET, BLOB), ns=(time.time_ns(), time.time_ns()))
+    catalog.refresh()
+    calls.update(model=0, download=0)
+    fail.set()
+    outcomes, seconds = run_sessions(service, args.sessions)
+    errors = {str(outcome) for outcome in outcomes if isinstance(outcome, Exception)}
+    print(f"{args.sessions} failing sessions in {seconds:.2f}s: {calls['download']} download(s), "
+          f"{calls['model']} model call(s), errors {sorted(errors)}")
+    if calls["model"] != 1:
+        failures.append("a failing model call was repeated by waiters")
+    if errors != {"model unavailable"} or not all(isinstance(outcome, Exception) for outcome in outcomes):
+        failures.append("the model failure did not reach every session")
+
+    _, counters = telemetry.metrics.snapshot()
+    print({name: value for name, value in sorted(counters.items()) if name.endswith("_shared")})
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# Cold-start import report for the app's request path, based on
+# `python -X importtime`. Exits non-zero when the import budget is exceeded or
+# when a cloud SDK is imported eagerly, so it can run as a regression check.
+#
+#   python benchmarks/startup_time.py --budget-ms 2500
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MODULES = ["ndmo_service"]
+# These must only be imported on first use (see clients.py).
+DEFERRED_MODULES = ["google.cloud.bigquery", "google.cloud.storage", "google.genai", "vertexai"]
+
+
+def import_times(modules):
+    code = "; ".join(f"import {module}" for module in modules)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise SystemExit(proc.stderr.strip().splitlines()[-1])
+
+    entries = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--budget-ms", type=float, default=2500.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    # The fastest of several runs is the least noisy estimate of the real cost.
+    runs = [import_times(args.modules) for _ in range(args.repeat)]
+    entries = min(runs, key=lambda run: sum(self_us for _, self_us, _, _ in run))
+    total_ms = sum(self_us for _, self_us, _, _ in entries) / 1000
+
+    print(f"Imported {len(entries)} modules in {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    print(f"{'cumulative ms':>14}  module")
+    top_level = [entry for entry in entries if entry[3] <= 1]
+    for name, _, cumulative_us, _ in sorted(top_level, key=lambda entry: -entry[2])[:args.top]:
+        print(f"{cumulative_us / 1000:>14.1f}  {name}")
+
+    failures = []
+    imported = {name for name, _, _, _ in entries}
+    for module in DEFERRED_MODULES:
+        if module in imported:
+            failures.append(f"{module} is imported at startup")
+    if total_ms > args.budget_ms:
+        failures.append(f"startup imports took {total_ms:.1f} ms, over the {args.budget_ms:.0f} ms budget")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
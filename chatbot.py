@@ -1,56 +1,82 @@
 import os
 import streamlit as st
-from google import genai
-from google.genai.types import HttpOptions, Content, Part
+
+from conversation_context import ConversationContext, format_turns
+from model_gateway import get_gateway
 
 # Set your service account key JSON path here:
 os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = r"C:\Users\hkhandelwal3\OneDrive - Deloitte (O365D)\Desktop\NDMO\nse-gcp-ema-tt-beb55-sbx-1-b1166898ac8d.json"
 
-# Initialize GenAI client with Vertex AI config
-@st.cache_resource
-def load_client():
-    return genai.Client(
-        vertexai=True,
-        project="nse-gcp-ema-tt-beb55-sbx-1",
-        location="us-central1",
-        http_options=HttpOptions(api_version="v1")
+GCP_PROJECT_ID = "nse-gcp-ema-tt-beb55-sbx-1"
+GCP_LOCATION = "us-central1"
+
+# Calls go through the shared gateway, which keeps them within the Gemini quota
+# and retries throttled requests.
+def get_model_gateway():
+    return get_gateway(GCP_PROJECT_ID)
+
+MODEL_NAME = "gemini-2.5-pro"
+# Older turns are summarized by a cheaper model.
+SUMMARY_MODEL = "gemini-2.5-flash"
+
+def summarize_turns(summary, turns, max_tokens):
+    from google.genai import types
+    prompt = (
+        "Update the summary of a conversation between a user and an assistant with the new turns below. "
+        "Keep facts, names, numbers, decisions and open questions; drop small talk. "
+        f"Answer with the summary only, in at most {max_tokens * 3 // 4} words.\n\n"
+        f"Current summary:\n{summary or '(none)'}\n\nNew turns:\n{format_turns(turns)}"
+    )
+    # Thinking tokens count against max_output_tokens, so thinking is off here.
+    config = types.GenerateContentConfig(
+        max_output_tokens=max_tokens,
+        thinking_config=types.ThinkingConfig(thinking_budget=0),
+    )
+    response = get_model_gateway().generate(SUMMARY_MODEL, [prompt], config=config, location=GCP_LOCATION)
+    if not response.text:
+        # The context then keeps the folded turns by truncating instead.
+        raise ValueError("Empty conversation summary")
+    return response.text
+
+def stream_reply(context):
+    from google.genai import types
+    config = types.GenerateContentConfig(system_instruction=context.system_instruction())
+    stream = get_model_gateway().generate_stream(
+        MODEL_NAME, context.contents(), config=config, location=GCP_LOCATION
     )
+    try:
+        for chunk in stream:
+            if chunk.text:
+                yield chunk.text
+    finally:
+        stream.close()
 
 def main():
     st.title("Gemini 2.5 Pro Chatbot")
 
-    client = load_client()
-    model_name = "gemini-2.5-pro"
-
+    # Only the context's recent turns and summary are sent, so each turn costs
+    # the same however long the conversation gets.
     if "conversation" not in st.session_state:
-        st.session_state.conversation = []
-
-    user_input = st.text_input("You:", placeholder="Ask me anything!")
-
-    if st.button("Send") and user_input.strip():
-        st.session_state.conversation.append(
-            Content(role="user", parts=[Part(text=user_input)])
-        )
-
-        with st.spinner("Thinking..."):
-            response = client.models.generate_content(
-                model=model_name,
-                contents=st.session_state.conversation
-            )
-            ai_text = response.text
-            st.session_state.conversation.append(
-                Content(role="model", parts=[Part(text=ai_text)])
-            )
-
-        st.rerun()  # Updated from experimental_rerun
-
-    if st.session_state.conversation:
-        for turn in st.session_state.conversation:
-            if turn.role == "user":
-                st.markdown(f"**You:** {turn.parts[0].text}")
-            elif turn.role == "model":
-                st.markdown(f"**AI:** {turn.parts[0].text}")
-            st.markdown("---")
+        st.session_state.conversation = ConversationContext(summarize_turns)
+    context = st.session_state.conversation
+
+    for role, text in context.transcript:
+        with st.chat_message("user" if role == "user" else "assistant"):
+            st.markdown(text)
+
+    user_input = st.chat_input("Ask me anything!")
+
+    if user_input and user_input.strip():
+        context.add("user", user_input)
+        with st.chat_message("user"):
+            st.markdown(user_input)
+
+        # The reply is written as it streams, below the turns already on screen.
+        with st.chat_message("assistant"):
+            ai_text = st.write_stream(stream_reply(context))
+        context.add("model", ai_text if isinstance(ai_text, str) else "".join(map(str, ai_text)))
+        # Turns that no longer fit are summarized in the background.
+        context.compact()
 
 if __name__ == "__main__":
     main()
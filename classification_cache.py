@@ -0,0 +1,144 @@
+# Content-addressed cache for classification results: an in-process LRU tier
+# in front of a SQLite tier that survives restarts.
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import pandas as pd
+
+from ndmo_models import ClassificationMetadata
+
+CACHE_DIR = os.environ.get("NDMO_CACHE_DIR", ".ndmo_cache")
+MEMORY_MAX_ENTRIES = 32
+DISK_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+
+
+def dataset_fingerprint(df: pd.DataFrame) -> str:
+    digest = hashlib.sha256()
+    digest.update("\x1f".join(map(str, df.columns)).encode("utf-8"))
+    digest.update("\x1f".join(map(str, df.dtypes)).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def blob_fingerprint(bucket_name: str, blob_name: str, generation, md5_hash=None) -> str:
+    # GCS generations change on every overwrite, so they identify content without reading it.
+    return f"gcs:{bucket_name}/{blob_name}#{generation}:{md5_hash or ''}"
+
+
+def cache_key(fingerprint: str, model: str, prompt_version: str) -> str:
+    return f"{fingerprint}|{model}|{prompt_version}"
+
+
+class ClassificationCache:
+    def __init__(self, path: Optional[str] = None, max_entries: int = MEMORY_MAX_ENTRIES,
+                 max_bytes: int = DISK_MAX_BYTES, ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        if path is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            path = os.path.join(CACHE_DIR, "classifications.sqlite")
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS classifications (
+                key TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_classifications_fingerprint ON classifications (fingerprint)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_classifications_accessed ON classifications (accessed_at)")
+        self._db.commit()
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def get(self, key: str) -> Optional[ClassificationMetadata]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created_at, result = entry
+                if not self._expired(created_at, now):
+                    self._memory.move_to_end(key)
+                    return result
+                del self._memory[key]
+
+            row = self._db.execute(
+                "SELECT payload, created_at FROM classifications WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            payload, created_at = row
+            if self._expired(created_at, now):
+                self._db.execute("DELETE FROM classifications WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+            self._db.execute("UPDATE classifications SET accessed_at = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            result = ClassificationMetadata.model_validate_json(payload)
+            self._remember(key, created_at, result)
+            return result
+
+    def put(self, key: str, result: ClassificationMetadata):
+        now = time.time()
+        payload = result.model_dump_json()
+        fingerprint = key.split("|", 1)[0]
+        with self._lock:
+            self._remember(key, now, result)
+            self._db.execute(
+                "INSERT OR REPLACE INTO classifications VALUES (?, ?, ?, ?, ?, ?)",
+                (key, fingerprint, payload, len(payload), now, now),
+            )
+            self._evict_disk()
+            self._db.commit()
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._memory.pop(key, None)
+            self._db.execute("DELETE FROM classifications WHERE key = ?", (key,))
+            self._db.commit()
+
+    def invalidate_dataset(self, fingerprint: str):
+        with self._lock:
+            for key in [k for k in self._memory if k.split("|", 1)[0] == fingerprint]:
+                del self._memory[key]
+            self._db.execute("DELETE FROM classifications WHERE fingerprint = ?", (fingerprint,))
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._db.execute("DELETE FROM classifications")
+            self._db.commit()
+
+    def _remember(self, key: str, created_at: float, result: ClassificationMetadata):
+        self._memory[key] = (created_at, result)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        # Drop least recently used rows until the tier fits its byte budget.
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM classifications").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._db.execute("SELECT key, size FROM classifications ORDER BY accessed_at").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM classifications WHERE key = ?", (key,))
+            total -= size
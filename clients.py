@@ -0,0 +1,67 @@
+# Process-wide registry of lazily constructed clients. Python modules outlive
+# Streamlit script reruns, so anything created here is built once per server
+# process, and the google-cloud SDKs are only imported on first use.
+import threading
+
+_registry = {}
+# Re-entrant so a factory can request other shared objects while being built.
+_lock = threading.RLock()
+
+
+def shared(key, factory):
+    instance = _registry.get(key)
+    if instance is None:
+        with _lock:
+            instance = _registry.get(key)
+            if instance is None:
+                instance = _registry[key] = factory()
+    return instance
+
+
+def reset(key=None):
+    with _lock:
+        if key is None:
+            _registry.clear()
+        else:
+            _registry.pop(key, None)
+
+
+def bigquery_client(project=None, credentials_file=None):
+    def factory():
+        from google.cloud import bigquery
+        if credentials_file:
+            return bigquery.Client.from_service_account_json(credentials_file, project=project)
+        return bigquery.Client(project=project)
+    return shared(("bigquery", project, credentials_file), factory)
+
+
+def storage_client(project=None, credentials_file=None):
+    def factory():
+        from google.cloud import storage
+        if credentials_file:
+            return storage.Client.from_service_account_json(credentials_file, project=project)
+        return storage.Client(project=project)
+    return shared(("storage", project, credentials_file), factory)
+
+
+def genai_client(project, location, credentials_file=None, max_connections=None):
+    def factory():
+        from google import genai
+        from google.genai import types
+        credentials = None
+        if credentials_file:
+            from google.oauth2 import service_account
+            credentials = service_account.Credentials.from_service_account_file(
+                credentials_file, scopes=["https://www.googleapis.com/auth/cloud-platform"]
+            )
+        http_options = None
+        if max_connections:
+            import httpx
+            # One keep-alive pool per client, reused by every request from the process.
+            limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+            http_options = types.HttpOptions(client_args={"limits": limits})
+        return genai.Client(
+            vertexai=True, project=project, location=location,
+            credentials=credentials, http_options=http_options,
+        )
+    return shared(("genai", project, location, credentials_file, max_connections), factory)
@@ -0,0 +1,110 @@
+# Bounded context for multi-turn chats. The last few turns are sent verbatim;
+# older ones are folded into a rolling summary that is passed as the system
+# instruction, so the prompt stays within a fixed token budget however long the
+# conversation runs. Folding calls the model, so it runs in the background after
+# a reply and the next turn only waits for it if it has not finished yet.
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from model_scheduler import CHARS_PER_TOKEN
+
+logger = logging.getLogger(__name__)
+
+# Messages (user or model) always sent verbatim.
+RECENT_TURNS = 8
+# Upper bound for the verbatim turns plus the summary.
+CONTEXT_TOKEN_BUDGET = 6000
+SUMMARY_TOKEN_BUDGET = 800
+
+_folds = ThreadPoolExecutor(max_workers=4, thread_name_prefix="conversation-fold")
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def format_turns(turns: List[Tuple[str, str]]) -> str:
+    return "\n".join(f"{'User' if role == 'user' else 'Assistant'}: {text}" for role, text in turns)
+
+
+class ConversationContext:
+    # summarize(summary, turns, max_tokens) returns a new summary covering the
+    # previous summary and the (role, text) turns being folded into it.
+    def __init__(self, summarize: Callable[[str, List[Tuple[str, str]], int], str],
+                 recent_turns: int = RECENT_TURNS, token_budget: int = CONTEXT_TOKEN_BUDGET,
+                 summary_budget: int = SUMMARY_TOKEN_BUDGET):
+        self.summarize = summarize
+        self.recent_turns = recent_turns
+        self.token_budget = token_budget
+        self.summary_budget = summary_budget
+        self.summary = ""
+        self.turns: List[Tuple[str, str]] = []
+        # Every message, for display only; never sent to the model.
+        self.transcript: List[Tuple[str, str]] = []
+        self._lock = threading.Lock()
+        self._fold = None
+
+    def add(self, role: str, text: str):
+        with self._lock:
+            self.turns.append((role, text))
+            self.transcript.append((role, text))
+
+    def _wait_for_fold(self):
+        fold = self._fold
+        if fold is not None:
+            fold.result()
+
+    def contents(self) -> List[Dict]:
+        # The turns to send, oldest first, in the google-genai dict form.
+        self._wait_for_fold()
+        with self._lock:
+            return [{"role": role, "parts": [{"text": text}]} for role, text in self.turns]
+
+    def system_instruction(self) -> Optional[str]:
+        self._wait_for_fold()
+        with self._lock:
+            if not self.summary:
+                return None
+            return f"Summary of the earlier part of this conversation:\n{self.summary}"
+
+    def context_tokens(self) -> int:
+        with self._lock:
+            return estimate_tokens(self.summary) + sum(estimate_tokens(text) for _, text in self.turns)
+
+    def _to_fold(self) -> int:
+        # How many of the oldest turns must go, in user/model pairs so the
+        # verbatim part still starts with a user message.
+        budget = self.token_budget - self.summary_budget
+        count = 0
+        remaining = [estimate_tokens(text) for _, text in self.turns]
+        while len(self.turns) - count > self.recent_turns or (
+            sum(remaining[count:]) > budget and len(self.turns) - count > 2
+        ):
+            count += 2
+        return min(count, len(self.turns))
+
+    def compact(self, wait: bool = False):
+        # Folds the turns that no longer fit into the summary, in the background.
+        self._wait_for_fold()
+        with self._lock:
+            count = self._to_fold()
+            if not count:
+                return
+            folded, self.turns = self.turns[:count], self.turns[count:]
+            summary = self.summary
+        self._fold = _folds.submit(self._apply_fold, summary, folded)
+        if wait:
+            self._wait_for_fold()
+
+    def _apply_fold(self, summary, folded):
+        try:
+            summary = self.summarize(summary, folded, self.summary_budget)
+        except Exception as e:
+            # Keep what fits of the folded turns rather than losing them.
+            logger.warning("Conversation summary failed, truncating instead: %s", e)
+            text = (summary + "\n" + format_turns(folded)).strip()
+            summary = text[-self.summary_budget * CHARS_PER_TOKEN:]
+        with self._lock:
+            self.summary = summary
@@ -0,0 +1,98 @@
+# Server-side paging for dataset previews. Filtering and sorting produce a
+# "view" (row positions into the DataFrame); pages are slices of a view. Both
+# are cached, so moving between pages only ships page_size rows to the browser.
+# A view holds 8 bytes per row, so the view cache is bounded by bytes as well,
+# and the unfiltered, unsorted view is a range that is never stored.
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from classification_cache import dataset_fingerprint
+
+PAGE_SIZES = [25, 50, 100, 250]
+MAX_CACHED_VIEWS = 32
+MAX_CACHED_VIEW_BYTES = 256 * 1024 * 1024
+MAX_CACHED_PAGES = 256
+
+
+class ViewKey(NamedTuple):
+    fingerprint: str
+    sort_by: Optional[str]
+    ascending: bool
+    filter_column: Optional[str]
+    filter_text: str
+
+
+def view_positions(df: pd.DataFrame, sort_by: Optional[str] = None, ascending: bool = True,
+                   filter_column: Optional[str] = None, filter_text: str = "") -> np.ndarray:
+    positions = np.arange(len(df))
+    if filter_column and filter_text:
+        # Case-insensitive substring match on the displayed value.
+        matches = df[filter_column].astype(str).str.contains(filter_text, case=False, regex=False)
+        positions = np.flatnonzero(matches.to_numpy())
+    if sort_by:
+        values = df[sort_by].iloc[positions].reset_index(drop=True)
+        order = values.sort_values(ascending=ascending, kind="stable", na_position="last").index.to_numpy()
+        positions = positions[order]
+    return positions
+
+
+class PreviewPageCache:
+    def __init__(self, max_views: int = MAX_CACHED_VIEWS, max_pages: int = MAX_CACHED_PAGES,
+                 max_view_bytes: int = MAX_CACHED_VIEW_BYTES):
+        self.max_views = max_views
+        self.max_pages = max_pages
+        self.max_view_bytes = max_view_bytes
+        self._views = OrderedDict()
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _lookup(self, store: OrderedDict, key):
+        with self._lock:
+            value = store.get(key)
+            if value is not None:
+                store.move_to_end(key)
+            return value
+
+    def _remember(self, store: OrderedDict, key, value, limit: int, max_bytes: Optional[int] = None):
+        with self._lock:
+            store[key] = value
+            store.move_to_end(key)
+            while len(store) > limit or (
+                max_bytes is not None and sum(item.nbytes for item in store.values()) > max_bytes
+            ):
+                store.popitem(last=False)
+
+    def view(self, df: pd.DataFrame, sort_by: Optional[str] = None, ascending: bool = True,
+             filter_column: Optional[str] = None, filter_text: str = "") -> Tuple[ViewKey, Union[np.ndarray, range]]:
+        # Datasets loaded from GCS carry their blob generation; anything else is hashed.
+        fingerprint = df.attrs.get("fingerprint") or dataset_fingerprint(df)
+        key = ViewKey(fingerprint, sort_by, ascending, filter_column, filter_text.strip())
+        if not sort_by and not (filter_column and key.filter_text):
+            return key, range(len(df))
+        positions = self._lookup(self._views, key)
+        if positions is None:
+            positions = view_positions(df, sort_by, ascending, filter_column, key.filter_text)
+            self._remember(self._views, key, positions, self.max_views, self.max_view_bytes)
+        return key, positions
+
+    def page(self, df: pd.DataFrame, page: int, page_size: int, sort_by: Optional[str] = None,
+             ascending: bool = True, filter_column: Optional[str] = None, filter_text: str = "",
+             columns: Optional[Sequence[str]] = None) -> Tuple[pd.DataFrame, int]:
+        # Returns the rows of 1-based `page` and the number of rows in the view.
+        view_key, positions = self.view(df, sort_by, ascending, filter_column, filter_text)
+        columns = tuple(columns) if columns else tuple(df.columns)
+        key = (view_key, columns, page, page_size)
+        rows = self._lookup(self._pages, key)
+        if rows is None:
+            start = (page - 1) * page_size
+            rows = df.iloc[positions[start:start + page_size]][list(columns)]
+            self._remember(self._pages, key, rows, self.max_pages)
+        return rows, len(positions)
+
+
+def page_count(total_rows: int, page_size: int) -> int:
+    return max(1, -(-total_rows // page_size))
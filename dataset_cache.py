@@ -0,0 +1,107 @@
+# Local columnar copies of GCS datasets, keyed by blob generation. A metadata-only
+# lookup decides whether the cached Arrow file is still current; the CSV is only
+# downloaded and parsed again when the object has changed. Concurrent loads of
+# the same version share a single download and parse.
+import glob
+import os
+import threading
+from io import BytesIO
+
+import pandas as pd
+import pyarrow as pa
+
+import telemetry
+from classification_cache import CACHE_DIR, blob_fingerprint
+from singleflight import SingleFlight
+
+
+class DatasetCache:
+    def __init__(self, cache_dir: str = os.path.join(CACHE_DIR, "datasets")):
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+        self._flights = SingleFlight("dataset_load")
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, bucket_name: str, blob_name: str, generation) -> str:
+        safe_name = blob_name.replace("/", "__")
+        return os.path.join(self.cache_dir, f"{bucket_name}__{safe_name}.{generation}.arrow")
+
+    def load(self, bucket, blob_name: str, generation=None, md5_hash=None) -> pd.DataFrame:
+        # Every caller gets its own shallow copy, so attrs and column changes stay private.
+        key = (bucket.name, blob_name, generation)
+        df = self._flights.do(key, lambda: self._load(bucket, blob_name, generation, md5_hash))
+        return df.copy(deep=False)
+
+    def _load(self, bucket, blob_name: str, generation=None, md5_hash=None) -> pd.DataFrame:
+        # A generation already known from the dataset catalog skips the metadata call.
+        if generation is not None:
+            path = self._path(bucket.name, blob_name, generation)
+            if os.path.exists(path):
+                telemetry.count("dataset_cache_hits")
+                with telemetry.span("arrow_read"):
+                    df = read_arrow(path)
+                df.attrs["fingerprint"] = blob_fingerprint(bucket.name, blob_name, generation, md5_hash)
+                df.attrs["generation"] = generation
+                return df
+
+        # get_blob only fetches object metadata; it returns None when the object is missing.
+        with telemetry.span("gcs_metadata"):
+            blob = bucket.get_blob(blob_name)
+        if blob is None:
+            raise FileNotFoundError(f"{bucket.name}/{blob_name} not found")
+        path = self._path(bucket.name, blob_name, blob.generation)
+
+        if os.path.exists(path):
+            telemetry.count("dataset_cache_hits")
+            with telemetry.span("arrow_read"):
+                df = read_arrow(path)
+        else:
+            telemetry.count("dataset_cache_misses")
+            with telemetry.span("gcs_download"):
+                data = blob.download_as_bytes()
+            telemetry.count("bytes_downloaded", len(data))
+            with telemetry.span("csv_parse"):
+                df = pd.read_csv(BytesIO(data))
+            del data
+            with self._lock:
+                write_arrow(df, path)
+                self._drop_stale(bucket.name, blob_name, path)
+
+        df.attrs["fingerprint"] = blob_fingerprint(bucket.name, blob_name, blob.generation, blob.md5_hash)
+        df.attrs["generation"] = blob.generation
+        return df
+
+    def iter_batches(self, bucket_name: str, blob_name: str, generation, chunk_rows: int):
+        # Re-reads a cached version in chunks (for exports) without materializing it.
+        path = self._path(bucket_name, blob_name, generation)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{bucket_name}/{blob_name} has changed since it was classified")
+        with pa.memory_map(path, "r") as source:
+            reader = pa.ipc.open_file(source)
+            for index in range(reader.num_record_batches):
+                batch = reader.get_batch(index)
+                for start in range(0, batch.num_rows, chunk_rows):
+                    yield batch.slice(start, chunk_rows).to_pandas()
+
+    def _drop_stale(self, bucket_name: str, blob_name: str, current_path: str):
+        pattern = self._path(bucket_name, blob_name, "*")
+        for path in glob.glob(pattern):
+            if path != current_path:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+def write_arrow(df: pd.DataFrame, path: str):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+def read_arrow(path: str) -> pd.DataFrame:
+    with pa.memory_map(path, "r") as source:
+        return pa.ipc.open_file(source).read_all().to_pandas()
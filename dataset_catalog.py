@@ -0,0 +1,209 @@
+# Catalog of the NDMO datasets: blob names, GCS metadata, schema, row counts,
+# the last classification and request counts. It is loaded once per process,
+# refreshed from GCS in the background and persisted under NDMO_CACHE_DIR, so
+# listing, routing and size-aware planning never touch GCS on the request path.
+# Requests only mark the catalog dirty; the background thread writes it out.
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+from pydantic import BaseModel
+
+from classification_cache import CACHE_DIR
+from ndmo_models import ClassificationMetadata
+
+logger = logging.getLogger(__name__)
+
+CATALOG_PATH = os.path.join(CACHE_DIR, "catalog.json")
+REFRESH_INTERVAL_SECONDS = 300
+# How often the background thread writes out changes made by requests.
+SAVE_INTERVAL_SECONDS = 10
+WARM_UP_DATASETS = 3
+
+
+class DatasetEntry(NamedTuple):
+    category: str
+    blob_name: str
+    aliases: Sequence[str]
+    description: str = ""
+
+
+NDMO_DATASETS = [
+    DatasetEntry(
+        "bank", "Bank",
+        ["bank", "banks", "banking", "financial", "finance", "loan", "loans", "account", "accounts", "transactions"],
+        "Banking customers, accounts, transactions, loans and credit scores",
+    ),
+    DatasetEntry(
+        "smart city", "SmartCity",
+        ["smart city", "smartcity", "municipal", "municipality", "traffic", "permits", "utilities", "complaints"],
+        "Municipal smart city events, traffic, complaints, permits and utility usage",
+    ),
+    DatasetEntry(
+        "hospital", "Hospital",
+        ["hospital", "hospitals", "health", "healthcare", "medical", "patient", "patients", "clinical"],
+        "Hospital patients, diagnoses, admissions, discharges and recovery rates",
+    ),
+]
+
+BLOB_NAMES = {entry.category: entry.blob_name for entry in NDMO_DATASETS}
+
+
+class CatalogEntry(BaseModel):
+    category: str
+    blob_name: str
+    description: str = ""
+    columns: Dict[str, str] = {}
+    row_count: Optional[int] = None
+    byte_size: Optional[int] = None
+    generation: Optional[int] = None
+    md5_hash: Optional[str] = None
+    last_classification: Optional[ClassificationMetadata] = None
+    request_count: int = 0
+    refreshed_at: Optional[float] = None
+
+
+class DatasetCatalog:
+    def __init__(self, get_bucket, datasets: Sequence[DatasetEntry] = NDMO_DATASETS,
+                 path: str = CATALOG_PATH):
+        self._get_bucket = get_bucket
+        self.path = path
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._dirty = False
+        self.entries = {
+            dataset.category: CatalogEntry(
+                category=dataset.category, blob_name=dataset.blob_name, description=dataset.description
+            )
+            for dataset in datasets
+        }
+        self._load()
+
+    def get(self, category: str) -> Optional[CatalogEntry]:
+        return self.entries.get(category.lower())
+
+    def list(self) -> List[CatalogEntry]:
+        return list(self.entries.values())
+
+    def refresh(self):
+        # Metadata-only lookups; a new generation invalidates what was learned
+        # from the previous content.
+        bucket = self._get_bucket()
+        for entry in self.list():
+            try:
+                blob = bucket.get_blob(entry.blob_name)
+            except Exception as e:
+                logger.warning("Catalog refresh failed for %s: %s", entry.blob_name, e)
+                continue
+            if blob is None:
+                continue
+            with self._lock:
+                if entry.generation is not None and int(blob.generation) != entry.generation:
+                    entry.columns = {}
+                    entry.row_count = None
+                    entry.last_classification = None
+                entry.generation = int(blob.generation)
+                entry.md5_hash = blob.md5_hash
+                entry.byte_size = blob.size
+                entry.refreshed_at = time.time()
+        self._save()
+
+    def record_request(self, category: str):
+        entry = self.get(category)
+        if entry is not None:
+            with self._lock:
+                entry.request_count += 1
+                self._dirty = True
+
+    def record_dataset(self, category: str, df):
+        entry = self.get(category)
+        if entry is not None:
+            with self._lock:
+                entry.columns = {str(column): str(dtype) for column, dtype in df.dtypes.items()}
+                entry.row_count = len(df)
+                self._dirty = True
+
+    def record_classification(self, category: str, result):
+        entry = self.get(category)
+        if entry is not None:
+            with self._lock:
+                entry.last_classification = result
+                self._dirty = True
+
+    def start(self, warm_up=None):
+        # Refreshes metadata now and then every REFRESH_INTERVAL_SECONDS, after
+        # first pre-warming the most requested datasets with warm_up(category).
+        # In between, changes are written out every SAVE_INTERVAL_SECONDS.
+        def run():
+            self._safe_refresh()
+            if warm_up is not None:
+                for entry in sorted(self.list(), key=lambda e: -e.request_count)[:WARM_UP_DATASETS]:
+                    try:
+                        warm_up(entry.category)
+                    except Exception as e:
+                        logger.warning("Warm-up failed for %s: %s", entry.category, e)
+            refreshed_at = time.monotonic()
+            while not self._stop.wait(SAVE_INTERVAL_SECONDS):
+                if time.monotonic() - refreshed_at >= REFRESH_INTERVAL_SECONDS:
+                    self._safe_refresh()
+                    refreshed_at = time.monotonic()
+                else:
+                    self._safe_flush()
+
+        threading.Thread(target=run, name="dataset-catalog", daemon=True).start()
+        atexit.register(self._safe_flush)
+
+    def stop(self):
+        self._stop.set()
+        self._safe_flush()
+
+    def flush(self):
+        # Writes the catalog if anything changed since it was last written.
+        if self._dirty:
+            self._save()
+
+    def _safe_flush(self):
+        try:
+            self.flush()
+        except Exception as e:
+            logger.warning("Catalog save failed: %s", e)
+
+    def _safe_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.warning("Catalog refresh failed: %s", e)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable catalog %s: %s", self.path, e)
+            return
+        for data in stored:
+            entry = self.entries.get(data.get("category"))
+            # Definitions in code win; only learned metadata is restored.
+            if entry is not None and data.get("blob_name") == entry.blob_name:
+                data["description"] = entry.description
+                self.entries[entry.category] = CatalogEntry(**data)
+
+    def _save(self):
+        # The entries are copied under the lock and written outside it, so
+        # requests marking the catalog dirty never wait on the disk.
+        with self._save_lock:
+            with self._lock:
+                self._dirty = False
+                payload = [entry.model_dump() for entry in self.entries.values()]
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(payload, f)
+            os.replace(tmp_path, self.path)
@@ -1,139 +1,130 @@
 # ndmo_streamlit_app.py
+import os
+from datetime import datetime
+
 import streamlit as st
 import pandas as pd
-import json
 import random
-from io import BytesIO
-from datetime import datetime
-from google.cloud import storage, bigquery
-import vertexai
-from google import genai
-from google.genai import types
-from pydantic import BaseModel, ValidationError
-from typing import List, Dict, Any
-import re
-from difflib import get_close_matches
-
-# --- Constants ---
-GCP_PROJECT_ID = "nse-gcp-ema-tt-beb55-sbx-1"
-GCP_LOCATION = "us-central1"
-GCP_BUCKET_NAME = "ndmo-data"
-BQ_TABLE_ID = f"{GCP_PROJECT_ID}.falcons_dataset.data_requests"
-
-# Fixed requester ID (replace with your own default as needed)
-DEFAULT_REQUESTER_ID = 123456
-
-# --- Initialize Clients ---
-bq_client = bigquery.Client(project=GCP_PROJECT_ID)
-storage_client = storage.Client(project=GCP_PROJECT_ID)
-vertexai.init(project=GCP_PROJECT_ID, location=GCP_LOCATION)
-
-# --- Functions ---
-
-def detect_category(user_input):
-    categories = ["bank", "smart city", "hospital"]
-    user_input_lower = user_input.lower()
-    for category in categories:
-        if category in user_input_lower:
-            return category
-    matches = get_close_matches(user_input_lower, categories, n=1, cutoff=0.6)
-    if matches:
-        return matches[0]
-    return None
-
-class ClassificationOutput(BaseModel):
-    classification: str
-    impact_category: str
-    impact_level: str
-    excluded_columns: List[str]
-    justification: str
-    ndmo_reference: str
-    safe_dataset: List[Dict[str, Any]]
-
-def fetch_data_from_gcs(category):
-    file_map = {
-        "bank": "Bank",
-        "smart city": "SmartCity",
-        "hospital": "Hospital",
-    }
-    filename = file_map.get(category.lower())
-    if not filename:
-        return None, "Invalid category"
-    try:
-        bucket = storage_client.bucket(GCP_BUCKET_NAME)
-        blob = bucket.blob(filename)
-        data_bytes = blob.download_as_bytes()
-        df = pd.read_csv(BytesIO(data_bytes))
-        return df, "Success"
-    except Exception as e:
-        return None, f"Error fetching data: {e}"
-
-def classify_ndmo_data(file_text: str):
-    client = genai.Client(vertexai=True, project=GCP_PROJECT_ID, location="global")
-    model = "gemini-2.5-flash"
-    tools = [
-        types.Tool(
-            retrieval=types.Retrieval(
-                vertex_rag_store=types.VertexRagStore(
-                    rag_resources=[
-                        types.VertexRagStoreRagResource(
-                            rag_corpus="projects/997601944772/locations/us-central1/ragCorpora/4611686018427387904"
-                        )
-                    ]
-                )
-            )
+
+import telemetry
+from safe_export import EXPORT_FORMATS
+
+from job_queue import APPROVED, CLASSIFYING, FETCHING, QUEUED
+from ndmo_service import (
+    BQ_TABLE_ID,
+    DEFAULT_REQUESTER_ID,
+    detect_categories,
+    get_bigquery_client,
+    get_catalog,
+    get_history_store,
+    get_job_queue,
+    start_metrics_exporter,
+    submit_request,
+)
+
+# Set NDMO_ADMIN_PANEL=1 to show the metrics page in the sidebar.
+SHOW_ADMIN_PANEL = os.environ.get("NDMO_ADMIN_PANEL") == "1"
+# How often an unfinished ticket is polled.
+TICKET_POLL_SECONDS = 1.0
+
+TICKET_STEPS = [
+    (QUEUED, "⏳ Queued"),
+    (FETCHING, "📦 Fetching data"),
+    (CLASSIFYING, "🧠 Classifying"),
+]
+
+# --- UI Helpers ---
+
+@st.fragment
+def render_download(request_id, export):
+    # Runs as a fragment so preparing the file reruns only this block. The file
+    # is built on demand, and only this run keeps a reference to it.
+    fmt = st.selectbox(
+        "Export format",
+        options=list(EXPORT_FORMATS),
+        format_func=lambda key: EXPORT_FORMATS[key].label,
+        key=f"export_format_{request_id}",
+    )
+    if st.button("📦 Prepare Full Safe Dataset", key=f"prepare_{request_id}"):
+        try:
+            with st.spinner("Preparing download..."):
+                # download_button takes bytes, not the spooled temp file.
+                with export.open(fmt) as data:
+                    payload = data.read()
+        except Exception as e:
+            st.error(f"❌ Export failed: {e}")
+            return
+        st.download_button(
+            label="📥 Download Full Safe Dataset",
+            data=payload,
+            file_name=f"safe_dataset_{request_id}.{EXPORT_FORMATS[fmt].extension}",
+            mime=EXPORT_FORMATS[fmt].mime,
+            key=f"download_{request_id}"
         )
+
+def render_request(category, request_id, result, safe_preview, export, status, metrics):
+    if status != "Success":
+        st.error(f"❌ Failed to fetch data: {status}")
+        return
+    if not result:
+        st.error("❌ Classification failed. Please try again.")
+        return
+
+    st.success("✅ Classification Complete!")
+
+    metadata = result.model_dump()
+    st.markdown("### 📊 Classification Metadata")
+    st.json(metadata)
+
+    st.markdown("### 🔐 Safe Dataset Preview")
+    st.dataframe(safe_preview, height=300)
+
+    # ✅ New: Download full safe dataset
+    render_download(request_id, export)
+
+    st.markdown("---")
+    st.markdown("### 📋 Request Summary")
+    st.write(f"**Request ID:** `{request_id}`")
+    st.write(f"**Requester ID:** {DEFAULT_REQUESTER_ID}")
+    st.write(f"**Category:** {category.title()}")
+    st.write(f"**Classification:** {result.classification}")
+    st.write(f"**Justification:** {result.justification}")
+    with st.expander("⏱️ Request Metrics"):
+        st.json(metrics)
+
+@st.fragment(run_every=TICKET_POLL_SECONDS)
+def render_ticket_progress(request_id):
+    # Polls an unfinished ticket without rerunning the page; once it finishes,
+    # the whole page reruns once to render the result.
+    job = get_job_queue().get(request_id)
+    if job is None or job.finished:
+        st.rerun()
+
+    reached = [status for status, _ in TICKET_STEPS].index(job.status)
+    lines = [
+        f"{label} {'✔' if index < reached else '…'}"
+        for index, (_, label) in enumerate(TICKET_STEPS[:reached + 1])
     ]
-    prompt = f"""
-    Assume you are a data classifier. Classify the data based on NDMO policy.
-    Return JSON with:
-    {{
-      "classification": "<Level>",
-      "impact_category": "<Category>",
-      "impact_level": "<High/Medium/Low/None>",
-      "excluded_columns": ["<Column1>", ...],
-      "justification": "<Why>",
-      "ndmo_reference": "<Policy section>",
-      "safe_dataset": [{{ "column1": "value", ... }}]
-    }}
-    entity data: {file_text}
-    """
-    config = types.GenerateContentConfig(
-        system_instruction=[prompt],
-        tools=tools,
-        response_json_schema=ClassificationOutput.model_json_schema(),
-        response_mime_type="application/json"
-    )
-    response = client.models.generate_content(
-        model=model,
-        config=config,
-        contents=["Analyze the provided data and generate the classification report."]
-    )
-    try:
-        return ClassificationOutput.model_validate_json(response.text)
-    except ValidationError as e:
-        st.error(f"Validation failed:\n{e}")
-        st.json(response.text)
-        return None
-
-def log_request_to_bigquery(request_id, requester, classification, justification):
-    MAX_LENGTH = 255
-    now = datetime.utcnow()
-    now_iso = now.isoformat()
-    row = {
-        "request_id": int(request_id),
-        "requester": int(requester),
-        "classification": str(classification)[:MAX_LENGTH],
-        "request_time": now_iso,
-        "decision_time": now_iso,
-        "decision": str(justification)[:MAX_LENGTH],
-        "requested_data": str(category)[:MAX_LENGTH]
-    }
-    errors = bq_client.insert_rows_json(BQ_TABLE_ID, [row])
-    if errors == []:
-        st.success("")
+    st.info("  \n".join(lines))
+    # Metadata fields render as soon as the model streams them.
+    if job.fields:
+        st.markdown("  \n".join(
+            f"**{key.replace('_', ' ').title()}:** {value}" for key, value in job.fields.items()
+        ))
+    st.button("✖ Cancel Classification", key=f"cancel_{request_id}",
+              on_click=get_job_queue().cancel, args=(request_id,))
+
+def render_ticket(request_id, category):
+    st.caption(f"Ticket `{request_id}`")
+    job = get_job_queue().get(request_id)
+    if job is None:
+        st.warning("⚠️ This ticket has expired. Please send the query again.")
+    elif not job.finished:
+        render_ticket_progress(request_id)
+    elif job.status == APPROVED:
+        render_request(category, request_id, *job.result)
     else:
-        st.error(f"❌ Error logging to BigQuery: {errors}")
+        st.error(f"❌ {job.message}")
 
 # Optional: Test insert function to verify schema and permissions
 def test_bigquery_insert():
@@ -147,7 +138,7 @@ def test_bigquery_insert():
         "decision": "Test decision"
     }
     st.write("Running test insert row:", test_row)
-    errors = bq_client.insert_rows_json(BQ_TABLE_ID, [test_row])
+    errors = get_bigquery_client().insert_rows_json(BQ_TABLE_ID, [test_row])
     if errors:
         st.error(f"Error inserting test row: {errors}")
     else:
@@ -176,8 +167,14 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
-if "request_history" not in st.session_state:
-    st.session_state.request_history = []
+start_metrics_exporter()
+
+# Cursors of the history pages visited so far; the last one is shown.
+if "history_cursors" not in st.session_state:
+    st.session_state.history_cursors = [None]
+# (request_id, category) of the tickets from the latest query.
+if "tickets" not in st.session_state:
+    st.session_state.tickets = []
 
 st.markdown(
     """
@@ -190,12 +187,25 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
+pages = ["Query NDMO Data", "Request History"]
+if SHOW_ADMIN_PANEL:
+    pages.append("Metrics")
 page = st.sidebar.radio(
     "🔍 Navigate",
-    options=["Query NDMO Data", "Request History"],
+    options=pages,
     index=0,
 )
 
+# Served from the dataset catalog; GCS is only contacted by its background refresh.
+st.sidebar.markdown("### 📚 Available Datasets")
+for entry in get_catalog().list():
+    details = []
+    if entry.row_count is not None:
+        details.append(f"{entry.row_count:,} rows")
+    if entry.byte_size is not None:
+        details.append(f"{entry.byte_size / 1e6:.1f} MB")
+    st.sidebar.caption(f"**{entry.category.title()}** {' · '.join(details)}")
+
 if page == "Query NDMO Data":
     st.subheader("🗂️ Query NDMO Data")
 
@@ -210,81 +220,83 @@ if page == "Query NDMO Data":
         if not user_input.strip():
             st.warning("⚠️ Please enter a valid query.")
         else:
-            st.write(f"**User Query:** {user_input}")
-            category = detect_category(user_input)
-            if not category:
+            st.session_state.query = user_input
+            categories = detect_categories(user_input)
+            if not categories:
+                st.session_state.tickets = []
                 st.error("❌ Could not determine the data category from your query. Try mentioning 'bank', 'smart city', or 'hospital'.")
             else:
-                request_id = random.randint(10000000, 99999999)
-                df, status = fetch_data_from_gcs(category)
-
-                if df is not None and not df.empty:
-                    with st.spinner("📦 Fetching and classifying data..."):
-                        file_text = df.to_json(orient="records")
-                        result = classify_ndmo_data(file_text)
-
-                    if result:
-                        st.success("✅ Classification Complete!")
-
-                        metadata = result.model_dump(exclude={'safe_dataset'})
-                        st.markdown("### 📊 Classification Metadata")
-                        st.json(metadata)
-
-                        safe_df = pd.DataFrame(result.safe_dataset)
-                        st.markdown("### 🔐 Safe Dataset Preview")
-                        st.dataframe(safe_df.head(), height=300)
-
-                        # ✅ New: Download full safe dataset
-                        csv = safe_df.to_csv(index=False).encode('utf-8')
-                        st.download_button(
-                            label="📥 Download Full Safe Dataset",
-                            data=csv,
-                            file_name=f"safe_dataset_{request_id}.csv",
-                            mime="text/csv"
-                        )
-
-                        log_request_to_bigquery(
-                            request_id=request_id,
-                            requester=DEFAULT_REQUESTER_ID,
-                            classification=result.classification,
-                            justification=result.justification
-                        )
-
-                        st.markdown("---")
-                        st.markdown("### 📋 Request Summary")
-                        st.write(f"**Request ID:** `{request_id}`")
-                        st.write(f"**Requester ID:** {DEFAULT_REQUESTER_ID}")
-                        st.write(f"**Category:** {category.title()}")
-                        st.write(f"**Classification:** {result.classification}")
-                        st.write(f"**Justification:** {result.justification}")
-
-                        st.session_state.request_history.append(
-                            {
-                                "request_id": request_id,
-                                "requester": DEFAULT_REQUESTER_ID,
-                                "category": category,
-                                "classification": result.classification,
-                                "justification": result.justification,
-                                "timestamp": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC"),
-                            }
-                        )
-                    else:
-                        st.error("❌ Classification failed. Please try again.")
-                else:
-                    st.error(f"❌ Failed to fetch data: {status}")
+                # Every dataset gets its own ticket, handled by the background workers.
+                st.session_state.tickets = [
+                    (submit_request(category, random.randint(10000000, 99999999)).ticket_id, category)
+                    for category in categories
+                ]
+
+    if st.session_state.tickets:
+        st.write(f"**User Query:** {st.session_state.query}")
+    for request_id, category in st.session_state.tickets:
+        if len(st.session_state.tickets) > 1:
+            st.markdown(f"## 🗃️ {category.title()} Dataset")
+        render_ticket(request_id, category)
+        if len(st.session_state.tickets) > 1:
+            st.markdown("---")
 
 elif page == "Request History":
     st.subheader("📜 Request History")
 
-    if st.session_state.request_history:
-        df_history = pd.DataFrame(st.session_state.request_history)
-        df_history["timestamp"] = pd.to_datetime(df_history["timestamp"])
-        df_history = df_history.sort_values(by="timestamp", ascending=False)
+    # Only one page is read from the store, already sorted newest first.
+    cursors = st.session_state.history_cursors
+    history_page = get_history_store().page(DEFAULT_REQUESTER_ID, before=cursors[-1])
+
+    if history_page.rows:
+        df_history = pd.DataFrame(history_page.rows)
+        df_history["timestamp"] = pd.to_datetime(df_history.pop("created_at"), unit="s", utc=True)
 
         st.dataframe(
             df_history[["request_id", "requester", "category", "classification", "justification", "timestamp"]],
             use_container_width=True,
             height=400,
         )
+
+        newer, page_label, older = st.columns([1, 2, 1])
+        newer.button("⬅ Newer", disabled=len(cursors) == 1, on_click=cursors.pop)
+        page_label.caption(f"Page {len(cursors)}")
+        older.button(
+            "Older ➡",
+            disabled=history_page.next_cursor is None,
+            on_click=cursors.append,
+            args=(history_page.next_cursor,),
+        )
+    else:
+        st.info("No requests made yet. Your query history will appear here.")
+
+elif page == "Metrics":
+    st.subheader("⏱️ Metrics")
+
+    # Process-wide totals since the server started, shared by all sessions.
+    stages, counters = telemetry.metrics.snapshot()
+    if stages:
+        df_stages = pd.DataFrame(
+            [
+                {
+                    "stage": stage,
+                    "count": values["count"],
+                    "mean_ms": values["seconds"] / values["count"] * 1000,
+                    "total_s": values["seconds"],
+                    "max_rss_growth_mb": values["max_rss_growth"] / 1e6,
+                }
+                for stage, values in stages.items()
+            ]
+        ).sort_values(by="total_s", ascending=False)
+        st.dataframe(df_stages, use_container_width=True)
     else:
-        st.info("No requests made yet. Your query history will appear here.")
\ No newline at end of file
+        st.info("No requests have been traced yet.")
+
+    if counters:
+        st.dataframe(
+            pd.DataFrame(sorted(counters.items()), columns=["counter", "value"]),
+            use_container_width=True,
+        )
+    st.caption(f"Resident memory: {telemetry.rss_bytes() / 1e6:.0f} MB")
+    with st.expander("Prometheus exposition"):
+        st.code(telemetry.metrics.render_prometheus(), language="text")
@@ -0,0 +1,51 @@
+# Incremental parser for a streamed JSON object. Top-level fields are returned
+# as soon as their value is complete, before the rest of the object arrives.
+import json
+
+
+class IncrementalJSONObject:
+    def __init__(self):
+        self._buffer = ""
+        self._position = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._field_start = None
+        self.done = False
+
+    def feed(self, text):
+        # Returns the (key, value) pairs completed by this piece of text.
+        self._buffer += text
+        fields = []
+        while self._position < len(self._buffer) and not self.done:
+            char = self._buffer[self._position]
+            self._position += 1
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+                if self._depth == 1:
+                    self._field_start = self._position
+            elif char in "}]":
+                if self._depth == 1:
+                    fields.extend(self._complete_field())
+                    self.done = True
+                self._depth -= 1
+            elif char == "," and self._depth == 1:
+                fields.extend(self._complete_field())
+                self._field_start = self._position
+        return fields
+
+    def _complete_field(self):
+        segment = self._buffer[self._field_start:self._position - 1].strip()
+        if not segment:
+            return []
+        return list(json.loads("{" + segment + "}").items())
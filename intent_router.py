@@ -0,0 +1,123 @@
+# Tiered local router from a free-text request to dataset categories:
+#   1. exact keyword/alias index (cost grows with the query, not the catalog)
+#   2. fuzzy match of each query word (or word pair) against the alias and
+#      description words: a character trigram index finds the candidates and
+#      an edit-similarity cutoff confirms them, so typos match but words that
+#      merely share an ending ("nothing", "thanks") do not
+#   3. optional LLM fallback
+# Local decisions are memoized per normalized query. The LLM fallback is not:
+# it may fail or come back empty, and that must not stick to the query.
+import re
+from collections import defaultdict, Counter
+from difflib import SequenceMatcher
+from functools import lru_cache
+from typing import Callable, List, Optional, Sequence
+
+from dataset_catalog import DatasetEntry, NDMO_DATASETS
+
+# Edit similarity (difflib ratio) a query word needs to match a known word; at
+# 0.85 a one-letter typo is accepted from seven letters on.
+FUZZY_MIN_RATIO = 0.85
+# Description words shorter than this ("rates", "usage") are too generic to route on.
+MIN_DESCRIPTION_WORD = 6
+ROUTE_CACHE_SIZE = 4096
+
+
+def normalize(text: str) -> str:
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", text.lower()).split())
+
+
+def trigrams(text: str) -> Counter:
+    padded = f" {text} "
+    return Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class IntentRouter:
+    def __init__(self, entries: Sequence[DatasetEntry] = NDMO_DATASETS,
+                 llm_fallback: Optional[Callable[[str], List[str]]] = None,
+                 min_ratio: float = FUZZY_MIN_RATIO):
+        self.llm_fallback = llm_fallback
+        self.min_ratio = min_ratio
+        self.categories = [entry.category for entry in entries]
+
+        # Tier 1: alias phrase (as a tuple of words) -> category.
+        self._aliases = {}
+        for entry in entries:
+            for alias in [entry.category, *entry.aliases]:
+                self._aliases[tuple(normalize(alias).split())] = entry.category
+        self._max_alias_words = max((len(words) for words in self._aliases), default=1)
+
+        # Tier 2: known terms (aliases and the longer description words) and
+        # a trigram -> term postings index over them.
+        self._terms = {}
+        for entry in entries:
+            for alias in [entry.category, *entry.aliases]:
+                self._terms.setdefault(normalize(alias), entry.category)
+            for word in normalize(entry.description).split():
+                if len(word) >= MIN_DESCRIPTION_WORD:
+                    self._terms.setdefault(word, entry.category)
+        self._postings = defaultdict(list)
+        for term in self._terms:
+            for gram in trigrams(term):
+                self._postings[gram].append(term)
+
+        self._route_local = lru_cache(maxsize=ROUTE_CACHE_SIZE)(self._match_local)
+
+    def route(self, query: str) -> List[str]:
+        query = normalize(query)
+        if not query:
+            return []
+        categories = list(self._route_local(query))
+        if not categories and self.llm_fallback is not None:
+            categories = [category for category in self.llm_fallback(query) if category in self.categories]
+        return categories
+
+    def _match_local(self, query: str):
+        return tuple(self.match_aliases(query) or self.match_fuzzy(query))
+
+    def match_aliases(self, query: str) -> List[str]:
+        # Longest alias at each position wins; results keep the order of mention.
+        words = query.split()
+        found = []
+        i = 0
+        while i < len(words):
+            for length in range(min(self._max_alias_words, len(words) - i), 0, -1):
+                category = self._aliases.get(tuple(words[i:i + length]))
+                if category is not None:
+                    if category not in found:
+                        found.append(category)
+                    i += length
+                    break
+            else:
+                i += 1
+        return found
+
+    def match_term(self, phrase: str) -> Optional[str]:
+        # Best known term for one query phrase, if it is similar enough. Only
+        # terms sharing at least two trigrams with it are compared.
+        shared = Counter(term for gram in trigrams(phrase) for term in self._postings.get(gram, ()))
+        best, best_ratio = None, self.min_ratio
+        for term, count in shared.items():
+            if count < 2:
+                continue
+            ratio = SequenceMatcher(None, phrase, term).ratio()
+            if ratio >= best_ratio:
+                best, best_ratio = term, ratio
+        return self._terms[best] if best is not None else None
+
+    def match_fuzzy(self, query: str) -> List[str]:
+        # Like match_aliases, with each word or word pair matched by similarity.
+        words = query.split()
+        found = []
+        i = 0
+        while i < len(words):
+            for length in range(min(self._max_alias_words, len(words) - i), 0, -1):
+                category = self.match_term(" ".join(words[i:i + length]))
+                if category is not None:
+                    if category not in found:
+                        found.append(category)
+                    i += length
+                    break
+            else:
+                i += 1
+        return found
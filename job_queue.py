@@ -0,0 +1,149 @@
+# Background execution of data requests. Submitting a request returns its
+# ticket at once; a shared worker pool fetches, classifies and logs it while the
+# ticket moves through queued -> fetching -> classifying -> approved | failed.
+# Sessions poll a ticket or wait for its next change, so a slow classification
+# holds a worker rather than a Streamlit script thread.
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+import telemetry
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+FETCHING = "fetching"
+CLASSIFYING = "classifying"
+APPROVED = "approved"
+FAILED = "failed"
+FINISHED = (APPROVED, FAILED)
+
+JOB_WORKERS = int(os.environ.get("NDMO_JOB_WORKERS", "8"))
+# Finished tickets, and the results they hold, are forgotten this long after
+# their last update. Sessions showing a result longer than that get it again
+# by sending the query again.
+JOB_TTL_SECONDS = 900
+
+
+class Job:
+    # Workers change a job only through update() and finish(); readers get a
+    # consistent copy from JobQueue.get() or JobQueue.wait().
+    def __init__(self, queue, ticket_id, payload):
+        self._queue = queue
+        self.ticket_id = ticket_id
+        self.payload = payload
+        self.status = QUEUED
+        self.message = ""
+        # Partial results published while the job runs, e.g. streamed metadata fields.
+        self.fields = {}
+        self.result = None
+        self.created_at = self.updated_at = time.time()
+        # Bumped on every change, so waiters can tell what they have already seen.
+        self.version = 0
+        self.cancel_event = threading.Event()
+
+    @property
+    def finished(self):
+        return self.status in FINISHED
+
+    def update(self, status: Optional[str] = None, message: Optional[str] = None, fields: Optional[Dict] = None):
+        with self._queue._changed:
+            if status is not None:
+                self.status = status
+            if message is not None:
+                self.message = message
+            if fields:
+                self.fields.update(fields)
+            self.updated_at = time.time()
+            self.version += 1
+            self._queue._changed.notify_all()
+
+    def finish(self, status: str, message: str = "", result: Any = None):
+        with self._queue._changed:
+            self.result = result
+        self.update(status, message)
+
+    def cancel(self):
+        # Queued jobs never start; running ones see cancel_event and stop early.
+        self.cancel_event.set()
+
+    def snapshot(self):
+        copy = Job.__new__(Job)
+        with self._queue._changed:
+            copy.__dict__.update(self.__dict__)
+            copy.fields = dict(self.fields)
+        return copy
+
+
+class JobQueue:
+    # run(job) does the work, reporting progress through job.update() and its
+    # outcome through job.finish(). A job that returns without finishing is
+    # approved; one that raises is failed with the error as its message.
+    def __init__(self, run: Callable[[Job], None], workers: int = JOB_WORKERS, ttl: float = JOB_TTL_SECONDS):
+        self.run = run
+        self.ttl = ttl
+        self._jobs: Dict[Any, Job] = {}
+        self._changed = threading.Condition()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ndmo-job")
+
+    def submit(self, ticket_id, payload=None) -> Job:
+        job = Job(self, ticket_id, payload)
+        with self._changed:
+            self._prune()
+            self._jobs[ticket_id] = job
+        telemetry.count("jobs_submitted")
+        self._pool.submit(self._execute, job)
+        return job.snapshot()
+
+    def _execute(self, job: Job):
+        if job.cancel_event.is_set():
+            job.finish(FAILED, "Cancelled")
+            return
+        # Time spent waiting for a worker; it grows when the pool is too small.
+        telemetry.metrics.observe("job_queue_wait", time.time() - job.created_at, 0)
+        try:
+            self.run(job)
+            if not job.finished:
+                job.finish(APPROVED)
+        except Exception as e:
+            logger.exception("Job %s failed", job.ticket_id)
+            job.finish(FAILED, str(e))
+        telemetry.count(f"jobs_{job.status}")
+
+    def get(self, ticket_id) -> Optional[Job]:
+        with self._changed:
+            self._prune()
+            job = self._jobs.get(ticket_id)
+        return job.snapshot() if job is not None else None
+
+    def wait(self, ticket_id, after_version: int = -1, timeout: Optional[float] = None) -> Optional[Job]:
+        # Returns once the job has changed since `after_version` (or has finished),
+        # or when the timeout expires; either way with the job's current state.
+        with self._changed:
+            self._changed.wait_for(
+                lambda: ticket_id not in self._jobs
+                or self._jobs[ticket_id].version > after_version
+                or self._jobs[ticket_id].finished,
+                timeout,
+            )
+        return self.get(ticket_id)
+
+    def cancel(self, ticket_id):
+        with self._changed:
+            job = self._jobs.get(ticket_id)
+        if job is not None:
+            job.cancel()
+
+    def pending(self) -> int:
+        with self._changed:
+            return sum(not job.finished for job in self._jobs.values())
+
+    def _prune(self):
+        # Runs on submit and on every read, so expired results are released
+        # even when no new tickets arrive.
+        cutoff = time.time() - self.ttl
+        for ticket_id in [t for t, job in self._jobs.items() if job.finished and job.updated_at < cutoff]:
+            del self._jobs[ticket_id]
@@ -0,0 +1,202 @@
+# Local stand-ins for the Google Cloud services used by the app, for offline
+# runs and tests. They mirror the subset of the client APIs the app calls.
+import base64
+import collections
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import types
+
+
+class LocalBlob:
+    # Like GCS, a blob pinned to a generation fails to read once it is overwritten.
+    def __init__(self, bucket, name, generation=None):
+        self.bucket = bucket
+        self.name = name
+        self.pinned_generation = generation
+        self.path = os.path.join(bucket.root, name)
+        self.latency = bucket.latency
+        stat = os.stat(self.path)
+        # GCS bumps the generation on every overwrite; the file's mtime plays that role here.
+        self.generation = stat.st_mtime_ns
+        self.size = stat.st_size
+        self._md5_hash = None
+
+    @property
+    def md5_hash(self):
+        if self._md5_hash is None:
+            with open(self.path, "rb") as f:
+                self._md5_hash = base64.b64encode(hashlib.md5(f.read()).digest()).decode("ascii")
+        return self._md5_hash
+
+    def _check_generation(self):
+        if self.pinned_generation is not None and os.stat(self.path).st_mtime_ns != self.pinned_generation:
+            raise FileNotFoundError(f"{self.name} generation {self.pinned_generation} no longer exists")
+
+    def open(self, mode="rb"):
+        time.sleep(self.latency)
+        self._check_generation()
+        return open(self.path, mode)
+
+    def download_as_bytes(self):
+        time.sleep(self.latency)
+        self._check_generation()
+        with open(self.path, "rb") as f:
+            return f.read()
+
+
+class LocalBucket:
+    # `latency` seconds are added to every simulated network call.
+    def __init__(self, root, name="local", latency=0.0):
+        self.root = root
+        self.name = name
+        self.latency = latency
+
+    def get_blob(self, name):
+        time.sleep(self.latency)
+        if not os.path.isfile(os.path.join(self.root, name)):
+            return None
+        return LocalBlob(self, name)
+
+    def blob(self, name, generation=None):
+        return LocalBlob(self, name, generation)
+
+
+class LocalStorageClient:
+    def __init__(self, root, latency=0.0):
+        self.root = root
+        self.latency = latency
+
+    def bucket(self, name):
+        return LocalBucket(os.path.join(self.root, name), name, self.latency)
+
+
+class LocalBigQueryClient:
+    # SQLite-backed stand-in for bigquery.Client.insert_rows_json.
+    def __init__(self, path=":memory:", latency=0.0):
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS rows (table_id TEXT NOT NULL, row TEXT NOT NULL)")
+
+    def insert_rows_json(self, table_id, rows, ignore_unknown_values=False):
+        time.sleep(self.latency)
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO rows VALUES (?, ?)", [(table_id, json.dumps(row)) for row in rows]
+            )
+            self._db.commit()
+        return []
+
+    def list_rows(self, table_id):
+        with self._lock:
+            cursor = self._db.execute("SELECT row FROM rows WHERE table_id = ?", (table_id,))
+            return [json.loads(row) for (row,) in cursor.fetchall()]
+
+
+class LocalAPIError(Exception):
+    # Shaped like google.genai.errors.APIError: HTTP status in .code.
+    def __init__(self, code, status, message):
+        super().__init__(f"{code} {status}. {message}")
+        self.code = code
+        self.status = status
+        self.message = message
+        self.response = None
+
+
+class LocalQuota:
+    # Sliding-window quota like the Vertex AI per-minute limits: a request is
+    # rejected with 429 RESOURCE_EXHAUSTED while the requests or tokens admitted
+    # in the last `window` seconds are at their share of rpm / tpm.
+    def __init__(self, rpm=None, tpm=None, window=60.0):
+        self.max_requests = rpm * window / 60 if rpm else None
+        self.max_tokens = tpm * window / 60 if tpm else None
+        self.window = window
+        self._events = collections.deque()
+        self._requests = 0
+        self._tokens = 0
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.rejected = 0
+
+    def _expire(self, now):
+        while self._events and self._events[0][0] <= now - self.window:
+            _, requests, tokens = self._events.popleft()
+            self._requests -= requests
+            self._tokens -= tokens
+
+    def admit(self, tokens):
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            if (self.max_requests is not None and self._requests + 1 > self.max_requests) or (
+                self.max_tokens is not None and self._tokens + tokens > self.max_tokens
+            ):
+                self.rejected += 1
+                raise LocalAPIError(429, "RESOURCE_EXHAUSTED", "Quota exceeded, please retry later.")
+            self.admitted += 1
+            self._events.append((now, 1, tokens))
+            self._requests += 1
+            self._tokens += tokens
+
+    def charge(self, tokens):
+        # Response tokens count against the window they were produced in.
+        with self._lock:
+            self._events.append((time.monotonic(), 0, tokens))
+            self._tokens += tokens
+
+
+def count_tokens(text):
+    return len(text) // 4
+
+
+class LocalResponse:
+    def __init__(self, text, usage_metadata=None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class LocalModels:
+    def __init__(self, respond, latency, chunk_chars, quota=None):
+        self.respond = respond
+        self.latency = latency
+        self.chunk_chars = chunk_chars
+        self.quota = quota
+
+    def _answer(self, model, contents, config):
+        prompt_tokens = count_tokens(str(contents) + str(getattr(config, "system_instruction", None) or ""))
+        if self.quota is not None:
+            self.quota.admit(prompt_tokens)
+        time.sleep(self.latency)
+        text = self.respond(model, contents, config)
+        response_tokens = count_tokens(text)
+        if self.quota is not None:
+            self.quota.charge(response_tokens)
+        usage = types.SimpleNamespace(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=response_tokens,
+            total_token_count=prompt_tokens + response_tokens,
+        )
+        return text, usage
+
+    def generate_content(self, model, contents, config=None):
+        return LocalResponse(*self._answer(model, contents, config))
+
+    def generate_content_stream(self, model, contents, config=None):
+        text, usage = self._answer(model, contents, config)
+        starts = range(0, len(text), self.chunk_chars)
+        for start in starts:
+            # Like Gemini, usage totals come with the final chunk.
+            last = start == starts[-1]
+            yield LocalResponse(text[start:start + self.chunk_chars], usage if last else None)
+
+
+class LocalGenAIClient:
+    # Stand-in for genai.Client: every request is answered with
+    # respond(model, contents, config) after `latency` seconds. With a
+    # LocalQuota, requests over quota fail with a 429 LocalAPIError.
+    def __init__(self, respond, latency=0.0, chunk_chars=256, quota=None):
+        self.models = LocalModels(respond, latency, chunk_chars, quota)
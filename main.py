@@ -1,15 +1,19 @@
-import os
 import streamlit as st
 import random
 import pandas as pd
 import uuid
-from google.cloud import storage, bigquery
-from io import BytesIO
-import vertexai
-from vertexai.preview.generative_models import GenerativeModel, GenerationConfig
 from datetime import datetime
 import json
 
+import clients
+from model_gateway import get_gateway
+from intent_router import IntentRouter
+from audit_logger import AuditLogger, BigQuerySink
+from dataset_cache import DatasetCache
+from dataset_catalog import BLOB_NAMES
+from data_pager import PAGE_SIZES, PreviewPageCache, page_count
+from job_queue import APPROVED, FAILED, FETCHING, JobQueue
+
 # Service account paths
 VERTEX_AI_CREDENTIALS = r"C:\\Users\\hkhandelwal3\\OneDrive - Deloitte (O365D)\\Desktop\\NDMO\\nse-gcp-ema-tt-beb55-sbx-1-b1166898ac8d.json"
 GCS_CREDENTIALS = r"C:\\Users\\hkhandelwal3\\OneDrive - Deloitte (O365D)\\Desktop\\NDMO\\nse-gcp-ema-tt-beb55-sbx-1-6196b2b0dfed.json"
@@ -21,62 +25,185 @@ GCP_PROJECT_ID = "nse-gcp-ema-tt-beb55-sbx-1"
 GCP_LOCATION = "us-central1"
 BQ_TABLE_ID = "nse-gcp-ema-tt-beb55-sbx-1.falcons_dataset.data_requests"
 
-# Set credentials for BigQuery
-os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = BIGQUERY_CREDENTIALS
-bq_client = bigquery.Client()
+# Clients are built on first use and shared across reruns (see clients.py)
+def get_bigquery_client():
+    return clients.bigquery_client(credentials_file=BIGQUERY_CREDENTIALS)
+
+def get_audit_logger():
+    return clients.shared(
+        "audit_logger", lambda: AuditLogger(BigQuerySink(get_bigquery_client(), BQ_TABLE_ID))
+    )
+
+def get_dataset_cache():
+    return clients.shared("dataset_cache", DatasetCache)
+
+def get_page_cache():
+    return clients.shared("page_cache", PreviewPageCache)
 
-@st.cache_resource
 def get_storage_client():
-    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = GCS_CREDENTIALS
-    return storage.Client()
+    return clients.storage_client(credentials_file=GCS_CREDENTIALS)
 
 def fetch_data_from_gcs(category):
     client = get_storage_client()
-    file_map = {
-        "bank": "Bank",
-        "smart city": "SmartCity",
-        "hospital": "Hospital",
-    }
-    filename = file_map.get(category.lower())
+    filename = BLOB_NAMES.get(category.lower())
     if not filename:
         return None, "Invalid category"
     try:
         bucket = client.bucket(GCP_BUCKET_NAME)
-        blob = bucket.blob(filename)
-        data_bytes = blob.download_as_bytes()
-        df = pd.read_csv(BytesIO(data_bytes))
+        df = get_dataset_cache().load(bucket, filename)
         return df, "Success"
     except Exception as e:
         return None, f"Error fetching data: {e}"
 
+def get_model_gateway():
+    return get_gateway(GCP_PROJECT_ID, credentials_file=VERTEX_AI_CREDENTIALS)
+
 def parse_with_gemini(user_text):
-    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = VERTEX_AI_CREDENTIALS
-    vertexai.init(project=GCP_PROJECT_ID, location=GCP_LOCATION)
-    model = GenerativeModel("gemini-2.5-pro")
+    from google.genai import types
 
-    prompt = f"Extract the data category from this query: '{user_text}'"
+    prompt = f"Extract every data category requested in this query: '{user_text}'"
 
-    generation_config = GenerationConfig(
+    generation_config = types.GenerateContentConfig(
         response_mime_type="application/json",
-        response_schema={
+        response_json_schema={
             "type": "object",
             "properties": {
-                "category": {
-                    "type": "string",
-                    "enum": ["bank", "smart city", "hospital"]
+                "categories": {
+                    "type": "array",
+                    "items": {
+                        "type": "string",
+                        "enum": ["bank", "smart city", "hospital"]
+                    }
                 }
             },
-            "required": ["category"]
+            "required": ["categories"]
         }
     )
 
     try:
-        response = model.generate_content(prompt, generation_config=generation_config)
-        json_response = response.candidates[0].content.parts[0].text
-        parsed = json.loads(json_response)
-        return parsed.get("category")
+        response = get_model_gateway().generate(
+            "gemini-2.5-pro", [prompt], config=generation_config, location=GCP_LOCATION
+        )
+        parsed = json.loads(response.text)
+        # Drop duplicates but keep the order the categories were mentioned in.
+        return list(dict.fromkeys(parsed.get("categories") or []))
     except Exception:
-        return None
+        return []
+
+def get_intent_router():
+    # Local alias and fuzzy matching first; Gemini is only asked when neither matches.
+    return clients.shared("intent_router", lambda: IntentRouter(llm_fallback=parse_with_gemini))
+
+def log_ticket(ticket_id, category, status_message):
+    # Save to BigQuery with NULLs where needed
+    row = {
+        "request_id": ticket_id,
+        "requester": None,  # NULL to avoid type mismatch
+        "classification": "Confidential" if category else None,
+        "request_time": datetime.now().isoformat(),
+        "decision_time": datetime.now().isoformat(),
+        "decision": status_message.replace("✅ ", "").replace("❌ ", "").replace("⏳ ", "")
+    }
+    get_audit_logger().log(row)
+
+def run_ticket(job):
+    # Runs on a job_queue worker, so the session is free while GCS is slow.
+    category = job.payload
+    job.update(FETCHING)
+    df, fetch_status = fetch_data_from_gcs(category)
+    if df is not None and not df.empty:
+        status_message = "✅ Approved"
+        log_ticket(job.ticket_id, category, status_message)
+        job.finish(APPROVED, status_message, df)
+    else:
+        status_message = f"❌ Failed to fetch data: {fetch_status}"
+        log_ticket(job.ticket_id, category, status_message)
+        job.finish(FAILED, status_message)
+
+def get_job_queue():
+    # Separate from the portal's queue: tickets here only fetch and log.
+    return clients.shared("chatbot_job_queue", lambda: JobQueue(run_ticket))
+
+def record_ticket(ticket_id, category, status_message):
+    # Save to session history; the status is updated when the ticket finishes.
+    st.session_state.request_history.append([
+        ticket_id,
+        category if category else "Unknown",
+        "Not specified",
+        status_message
+    ])
+
+def render_status(ticket_id, category, status_message):
+    status_df = pd.DataFrame({
+        "Process": ["Ticket ID", "Request Sent", "Data Retrieval"],
+        "Status": [
+            ticket_id,
+            f"✅ Sent for {category}" if category else "Invalid request",
+            status_message
+        ]
+    })
+
+    st.markdown('<div class="status-table">', unsafe_allow_html=True)
+    st.table(status_df)
+    st.markdown('</div>', unsafe_allow_html=True)
+
+def update_history(ticket_id, status_message):
+    for entry in st.session_state.request_history:
+        if entry[0] == ticket_id:
+            entry[3] = status_message
+
+@st.fragment(run_every=1.0)
+def render_ticket_progress(ticket_id, category):
+    # Polls the ticket; the page reruns once when it finishes.
+    job = get_job_queue().get(ticket_id)
+    if job is None or job.finished:
+        st.rerun()
+    render_status(ticket_id, category, f"⏳ In Progress ({job.status})")
+
+def render_ticket(ticket_id, category):
+    job = get_job_queue().get(ticket_id)
+    if job is None:
+        render_status(ticket_id, category, "❌ Ticket expired")
+    elif not job.finished:
+        render_ticket_progress(ticket_id, category)
+    else:
+        update_history(ticket_id, job.message)
+        if job.status == APPROVED:
+            st.success(f"✅ Data successfully fetched for {category}")
+            render_preview(ticket_id, job.result)
+        else:
+            st.error(job.message)
+        render_status(ticket_id, category, job.message)
+
+@st.fragment
+def render_preview(key, df):
+    # Only the current page is sent to the browser. Widgets here rerun just this
+    # fragment, so paging does not re-run the request above it.
+    columns = [str(column) for column in df.columns]
+    controls = st.columns([2, 2, 2, 1])
+    filter_column = controls[0].selectbox("Filter column", ["(none)"] + columns, key=f"filter_column_{key}")
+    filter_text = controls[1].text_input("Contains", key=f"filter_text_{key}")
+    sort_by = controls[2].selectbox("Sort by", ["(none)"] + columns, key=f"sort_by_{key}")
+    descending = controls[3].checkbox("Desc", key=f"descending_{key}")
+    shown = st.multiselect("Columns", columns, default=columns, key=f"columns_{key}")
+
+    filter_column = None if filter_column == "(none)" else filter_column
+    sort_by = None if sort_by == "(none)" else sort_by
+    cache = get_page_cache()
+    _, positions = cache.view(df, sort_by, not descending, filter_column, filter_text)
+
+    paging = st.columns([1, 1, 2])
+    page_size = paging[0].selectbox("Rows per page", PAGE_SIZES, key=f"page_size_{key}")
+    pages = page_count(len(positions), page_size)
+    page_key = f"page_{key}"
+    # A narrower filter or larger page size can leave the current page out of range.
+    if st.session_state.get(page_key, 1) > pages:
+        st.session_state[page_key] = pages
+    page = paging[1].number_input("Page", min_value=1, max_value=pages, step=1, key=page_key)
+    paging[2].caption(f"{len(positions):,} of {len(df):,} rows · page {page} of {pages}")
+
+    rows, _ = cache.page(df, page, page_size, sort_by, not descending, filter_column, filter_text, shown)
+    st.dataframe(rows, use_container_width=True)
 
 # Page config and styling
 st.set_page_config(page_title="NDMO Chatbot", layout="centered")
@@ -157,6 +284,9 @@ st.markdown("""
 
 if "request_history" not in st.session_state:
     st.session_state.request_history = []
+# (ticket_id, category) of the tickets from the latest message.
+if "tickets" not in st.session_state:
+    st.session_state.tickets = []
 
 tab1, tab2 = st.tabs(["📊 Data Chatbot", "📄 My Request History"])
 
@@ -167,63 +297,29 @@ with tab1:
     user_input = st.text_input("You:", placeholder="Ask for NDMO data like 'Get Smart City data'")
 
     if st.button("Send") and user_input.strip():
-        category = parse_with_gemini(user_input)
-        ticket_id = random.randint(10000000, 99999999)
-        status_message = "⏳ In Progress"
-
-        if category:
-            df, fetch_status = fetch_data_from_gcs(category)
-            if df is not None and not df.empty:
-                status_message = "✅ Approved"
-                st.success(f"✅ Data successfully fetched for {category}")
-                st.dataframe(df)
-            else:
-                status_message = f"❌ Failed to fetch data: {fetch_status}"
-                st.error(status_message)
+        categories = get_intent_router().route(user_input)
+        st.session_state.tickets = []
+
+        if categories:
+            # Every requested dataset gets its own ticket; the fetches run on
+            # background workers and the tickets are returned immediately.
+            for category in categories:
+                ticket_id = random.randint(10000000, 99999999)
+                get_job_queue().submit(ticket_id, category)
+                record_ticket(ticket_id, category, "⏳ In Progress")
+                st.session_state.tickets.append((ticket_id, category))
+            st.success("✅ Request queued for logging in BigQuery.")
         else:
             status_message = "❌ Could not identify category"
             st.warning("Could not identify a valid data category from your message.")
+            ticket_id = random.randint(10000000, 99999999)
+            record_ticket(ticket_id, None, status_message)
+            log_ticket(ticket_id, None, status_message)
+            st.success("✅ Request queued for logging in BigQuery.")
+            render_status(ticket_id, None, status_message)
 
-        # Save to session history
-        st.session_state.request_history.append([
-            ticket_id,
-            category if category else "Unknown",
-            "Not specified",
-            status_message
-        ])
-
-        # Save to BigQuery with NULLs where needed
-        row = {
-            "request_id": ticket_id,
-            "requester": None,  # NULL to avoid type mismatch
-            "classification": "Confidential" if category else None,
-            "request_time": datetime.now().isoformat(),
-            "decision_time": datetime.now().isoformat(),
-            "decision": status_message.replace("✅ ", "").replace("❌ ", "").replace("⏳ ", "")
-        }
-
-        try:
-            errors = bq_client.insert_rows_json(BQ_TABLE_ID, [row])
-            if errors == []:
-                st.success("✅ Request logged in BigQuery.")
-            else:
-                st.error(f"❌ Error logging request: {errors}")
-        except Exception as e:
-            st.error(f"❌ BigQuery insertion failed: {e}")
-
-        # Display status
-        status_df = pd.DataFrame({
-            "Process": ["Ticket ID", "Request Sent", "Data Retrieval"],
-            "Status": [
-                ticket_id,
-                f"✅ Sent for {category}" if category else "Invalid request",
-                status_message
-            ]
-        })
-
-        st.markdown('<div class="status-table">', unsafe_allow_html=True)
-        st.table(status_df)
-        st.markdown('</div>', unsafe_allow_html=True)
+    for ticket_id, category in st.session_state.tickets:
+        render_ticket(ticket_id, category)
 
 with tab2:
     st.markdown('<div class="main-title">My Request History</div>', unsafe_allow_html=True)
@@ -0,0 +1,100 @@
+# Shared entry point for every Gemini call in the process. Clients are kept per
+# project/location/credentials with a long-lived connection pool, and every call
+# is admitted by the model's ModelScheduler (see model_scheduler.py), which keeps
+# the process within quota and retries throttled calls.
+import time
+
+import clients
+import telemetry
+from model_scheduler import (
+    ModelScheduler,
+    backoff_seconds,
+    estimate_tokens,
+    is_retryable,
+    is_throttled,
+    retry_after_seconds,
+    used_tokens,
+)
+
+MAX_CONNECTIONS = 16
+
+
+class ModelGateway:
+    def __init__(self, project, credentials_file=None):
+        self.project = project
+        self.credentials_file = credentials_file
+
+    def client(self, location):
+        return clients.genai_client(self.project, location, self.credentials_file, MAX_CONNECTIONS)
+
+    def scheduler(self, model):
+        # Quotas are per project and model, so is the scheduler.
+        return clients.shared(("model_scheduler", self.project, model), ModelScheduler)
+
+    def generate(self, model, contents, config=None, location="global", priority=None):
+        # priority defaults to the one set with model_scheduler.priority().
+        client = self.client(location)
+        scheduler = self.scheduler(model)
+        cost = estimate_tokens(contents, config)
+
+        def send():
+            with telemetry.span("gemini_call"):
+                return client.models.generate_content(model=model, contents=contents, config=config)
+
+        response = scheduler.call(send, cost, priority)
+        scheduler.settle(cost, used_tokens(response))
+        record_usage(response)
+        return response
+
+    def generate_stream(self, model, contents, config=None, location="global", priority=None):
+        # The slot is held until the stream is exhausted or closed; closing the
+        # generator early (e.g. on cancel) also closes the HTTP stream. A stream
+        # is only retried if it failed before its first chunk.
+        client = self.client(location)
+        scheduler = self.scheduler(model)
+        cost = estimate_tokens(contents, config)
+        for attempt in range(scheduler.max_retries + 1):
+            scheduler.acquire(cost, priority)
+            throttled = False
+            retry_delay = None
+            chunk = None
+            try:
+                with telemetry.span("gemini_stream"):
+                    stream = client.models.generate_content_stream(model=model, contents=contents, config=config)
+                    try:
+                        for chunk in stream:
+                            yield chunk
+                    finally:
+                        # Usage totals arrive with the final chunk.
+                        record_usage(chunk)
+                        close = getattr(stream, "close", None)
+                        if close is not None:
+                            close()
+            except Exception as e:
+                throttled = is_throttled(e)
+                if throttled:
+                    telemetry.count("gemini_throttled")
+                if chunk is not None or not is_retryable(e) or attempt == scheduler.max_retries:
+                    raise
+                retry_delay = backoff_seconds(attempt, retry_after_seconds(e))
+            finally:
+                scheduler.release(throttled)
+            if retry_delay is None:
+                scheduler.settle(cost, used_tokens(chunk))
+                return
+            telemetry.count("gemini_retries")
+            time.sleep(retry_delay)
+
+
+def record_usage(response):
+    telemetry.count("gemini_calls")
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        telemetry.count("prompt_tokens", usage.prompt_token_count or 0)
+        telemetry.count("response_tokens", usage.candidates_token_count or 0)
+
+
+def get_gateway(project, credentials_file=None):
+    return clients.shared(
+        ("model_gateway", project, credentials_file), lambda: ModelGateway(project, credentials_file)
+    )
@@ -0,0 +1,224 @@
+# Quota-aware scheduling of Gemini calls. Each call waits for a slot from a
+# ModelScheduler before it is sent. The scheduler keeps requests/min and
+# tokens/min under quota with token buckets, lets interactive calls in ahead of
+# batch ones, and adapts how many calls may be in flight (AIMD): one more per
+# round of successes, half as many when the endpoint throttles. Throttled and
+# transient failures are retried after a jittered exponential backoff.
+import contextvars
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+import telemetry
+
+INTERACTIVE = 0
+BATCH = 1
+
+# Per model, per process. Defaults are well under the Vertex AI quotas for
+# gemini-2.5-pro; set them to the project's actual quota.
+GEMINI_RPM = int(os.environ.get("NDMO_GEMINI_RPM", "60"))
+GEMINI_TPM = int(os.environ.get("NDMO_GEMINI_TPM", "1000000"))
+# The buckets hold this many seconds' worth of quota, so calls are spread over
+# the minute instead of being spent in one burst.
+BURST_SECONDS = 1.0
+
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = 8
+# Throttling within this window of a decrease counts as the same event.
+DECREASE_INTERVAL_SECONDS = 1.0
+
+MAX_RETRIES = 5
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 32.0
+
+CHARS_PER_TOKEN = 4
+# Output tokens assumed for a call whose config sets no max_output_tokens.
+DEFAULT_OUTPUT_TOKENS = 1024
+
+THROTTLE_CODES = {429}
+TRANSIENT_CODES = {500, 502, 503, 504}
+
+_priority = contextvars.ContextVar("model_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def priority(level):
+    # Model calls made in this context (and in threads started with
+    # telemetry.propagate()) are scheduled at `level`.
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority():
+    return _priority.get()
+
+
+def error_code(error):
+    # google.genai.errors.APIError carries the HTTP status as .code.
+    code = getattr(error, "code", None)
+    return code if isinstance(code, int) else None
+
+
+def is_throttled(error):
+    return error_code(error) in THROTTLE_CODES or "RESOURCE_EXHAUSTED" in str(getattr(error, "status", ""))
+
+
+def is_retryable(error):
+    return is_throttled(error) or error_code(error) in TRANSIENT_CODES
+
+
+def backoff_seconds(attempt, retry_after=None):
+    # Full jitter: concurrent callers throttled together do not retry together.
+    delay = random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+    return max(delay, retry_after or 0)
+
+
+def retry_after_seconds(error):
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def estimate_tokens(contents, config=None):
+    # A rough count is enough: the bucket is corrected with the real usage.
+    text_chars = len(str(contents))
+    if config is not None:
+        text_chars += len(str(getattr(config, "system_instruction", None) or ""))
+    output_tokens = getattr(config, "max_output_tokens", None) or DEFAULT_OUTPUT_TOKENS
+    return text_chars // CHARS_PER_TOKEN + output_tokens
+
+
+def used_tokens(response):
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return None
+    total = getattr(usage, "total_token_count", None)
+    if total is None:
+        total = (usage.prompt_token_count or 0) + (usage.candidates_token_count or 0)
+    return total
+
+
+class TokenBucket:
+    # Refills continuously at per_minute / 60 per second up to `capacity`. A take
+    # larger than what is left puts the bucket in debt, which later takes repay.
+    def __init__(self, per_minute, burst_seconds=BURST_SECONDS, clock=time.monotonic):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.clock = clock
+        self.level = self.capacity
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount):
+        # Seconds until `amount` can be taken; amounts above the capacity only
+        # need a full bucket.
+        self._refill()
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount):
+        self._refill()
+        self.level -= amount
+
+    def drain(self):
+        self._refill()
+        self.level = min(self.level, 0.0)
+
+
+class ModelScheduler:
+    def __init__(self, rpm=GEMINI_RPM, tpm=GEMINI_TPM, max_concurrency=MAX_CONCURRENCY,
+                 min_concurrency=MIN_CONCURRENCY, max_retries=MAX_RETRIES, clock=time.monotonic):
+        self.requests = TokenBucket(rpm, clock=clock)
+        self.tokens = TokenBucket(tpm, clock=clock)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_retries = max_retries
+        self.clock = clock
+        # Starts wide open; throttling brings it down to what the quota sustains.
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self._last_decrease = float("-inf")
+        self._waiting = []
+        self._order = itertools.count()
+        self._cond = threading.Condition()
+
+    def acquire(self, cost, level=None):
+        # Blocks until this call is the most urgent waiter, under the concurrency
+        # limit, and both buckets can pay for it; waiters of equal priority go in
+        # arrival order.
+        entry = (current_priority() if level is None else level, next(self._order))
+        with self._cond, telemetry.span("gemini_wait"):
+            heapq.heappush(self._waiting, entry)
+            try:
+                while True:
+                    timeout = None
+                    if self._waiting[0] == entry and self.in_flight < int(self.limit):
+                        timeout = max(self.requests.delay(1), self.tokens.delay(cost))
+                        if timeout <= 0:
+                            break
+                    self._cond.wait(timeout)
+                self.requests.take(1)
+                self.tokens.take(cost)
+                self.in_flight += 1
+            finally:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+
+    def release(self, throttled=False):
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                now = self.clock()
+                if now - self._last_decrease >= DECREASE_INTERVAL_SECONDS:
+                    self._last_decrease = now
+                    self.limit = max(float(self.min_concurrency), self.limit / 2)
+                # The endpoint is out of quota now, whatever the bucket says.
+                self.requests.drain()
+            else:
+                self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def settle(self, estimated, actual):
+        # Charges (or refunds) the difference between estimated and actual tokens.
+        if actual is None:
+            return
+        with self._cond:
+            self.tokens.take(actual - estimated)
+            self._cond.notify_all()
+
+    def call(self, fn, cost=1, level=None):
+        # Runs fn() in a slot, retrying throttled and transient failures.
+        for attempt in range(self.max_retries + 1):
+            self.acquire(cost, level)
+            try:
+                result = fn()
+            except Exception as e:
+                throttled = is_throttled(e)
+                self.release(throttled)
+                if throttled:
+                    telemetry.count("gemini_throttled")
+                if not is_retryable(e) or attempt == self.max_retries:
+                    raise
+                telemetry.count("gemini_retries")
+                time.sleep(backoff_seconds(attempt, retry_after_seconds(e)))
+                continue
+            self.release()
+            return result
+
+    def stats(self):
+        with self._cond:
+            return {"limit": self.limit, "in_flight": self.in_flight, "waiting": len(self._waiting)}
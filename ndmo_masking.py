@@ -0,0 +1,207 @@
+# Masking and pseudonymization for safe datasets. Instead of dropping every
+# excluded column, identifiers are replaced with keyed tokens, contact details
+# are truncated and birth dates become age groups; for Secret and Top Secret
+# datasets, dates and amounts are generalized as well. A plan is derived once
+# from the classification result and applied chunk by chunk with vectorized
+# operations, so output is row-complete and the same input always gives the
+# same output for a given key.
+import base64
+import hashlib
+import os
+import secrets
+import tempfile
+from datetime import date
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from classification_cache import CACHE_DIR
+from ndmo_models import CLASSIFICATION_ORDER
+from ndmo_rules import match_column
+
+KEY_PATH = os.path.join(CACHE_DIR, "pseudonym.key")
+
+DROP = "drop"
+TOKENIZE = "tokenize"
+TRUNCATE_EMAIL = "truncate_email"
+TRUNCATE_PHONE = "truncate_phone"
+AGE_GROUP = "age_group"
+MONTH = "month"
+BUCKET = "bucket"
+
+# Transforms for excluded columns, by the ndmo_rules rule that matched them.
+# Anything else that was excluded (addresses, free text, unknown) is dropped.
+EXCLUDED_TRANSFORMS = {
+    "national_id": TOKENIZE,
+    "account_number": TOKENIZE,
+    "person_id": TOKENIZE,
+    "person_name": TOKENIZE,
+    "email": TRUNCATE_EMAIL,
+    "phone": TRUNCATE_PHONE,
+    "birth_date": AGE_GROUP,
+}
+
+# From this level up, quasi-identifiers in the remaining columns are generalized too.
+GENERALIZE_FROM = "Secret"
+
+AGE_BINS = [-np.inf, 20, 30, 40, 50, 60, np.inf]
+AGE_GROUPS = ["0-19", "20-29", "30-39", "40-49", "50-59", "60+"]
+
+_HEX_DIGITS = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+
+
+def load_key() -> str:
+    # NDMO_PSEUDONYM_KEY wins; otherwise a random key is created once and kept in
+    # the cache directory so tokens stay stable across restarts.
+    secret = os.environ.get("NDMO_PSEUDONYM_KEY")
+    if secret is None:
+        if not os.path.exists(KEY_PATH):
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            # Written aside and linked into place, so concurrent first requests
+            # agree on one key and never read a half-written file.
+            fd, temp_path = tempfile.mkstemp(dir=CACHE_DIR)
+            try:
+                with os.fdopen(fd, "w") as f:
+                    f.write(secrets.token_hex(32))
+                os.link(temp_path, KEY_PATH)
+            except FileExistsError:
+                pass
+            finally:
+                os.unlink(temp_path)
+        with open(KEY_PATH) as f:
+            secret = f.read().strip()
+    # pandas' keyed SipHash takes a 16-character key.
+    return base64.b64encode(hashlib.sha256(secret.encode("utf-8")).digest()).decode("ascii")[:16]
+
+
+def as_text(series: pd.Series) -> pd.Series:
+    # Whole numbers read as floats in one chunk (because of a null) and as ints in
+    # another must give the same text, or their tokens would differ.
+    if pd.api.types.is_float_dtype(series):
+        values = series.dropna()
+        if (values == np.floor(values)).all():
+            series = series.astype("Int64")
+    return series.astype(str)
+
+
+def tokenize(series: pd.Series, hash_key: str) -> pd.Series:
+    # Keyed SipHash of the text form, as 16 hex digits; equal values give equal tokens.
+    missing = series.isna().to_numpy()
+    values = as_text(series).to_numpy(dtype=object)
+    # Identifiers are mostly unique, so factorizing first would only add work.
+    hashes = pd.util.hash_array(values, hash_key=hash_key, categorize=False)
+    digits = hashes.astype(">u8").view(np.uint8).reshape(-1, 8)
+    hex_bytes = np.empty((len(hashes), 16), dtype=np.uint8)
+    hex_bytes[:, 0::2] = _HEX_DIGITS[digits >> 4]
+    hex_bytes[:, 1::2] = _HEX_DIGITS[digits & 0x0F]
+    tokens = pa.array(hex_bytes.view("S16").ravel(), type=pa.binary(16), mask=missing).cast(pa.string())
+    return pd.Series(pd.arrays.ArrowStringArray(tokens), index=series.index, name=series.name)
+
+
+def truncate_email(series: pd.Series) -> pd.Series:
+    # j.smith@example.com -> j***@example.com
+    return series.astype("string").str.replace(r"^([^@])[^@]*@", r"\1***@", regex=True)
+
+
+def truncate_phone(series: pd.Series) -> pd.Series:
+    # Keeps the last four digits.
+    digits = series.astype("string").str.replace(r"\D", "", regex=True)
+    return "***" + digits.str[-4:]
+
+
+def to_days(series: pd.Series) -> np.ndarray:
+    if not pd.api.types.is_datetime64_any_dtype(series):
+        parsed = pd.to_datetime(series, errors="coerce", format="ISO8601")
+        # Fall back to per-value format inference only when the fast path misses values.
+        if parsed.isna().sum() > series.isna().sum():
+            parsed = pd.to_datetime(series, errors="coerce", format="mixed")
+        series = parsed
+    return series.to_numpy(dtype="datetime64[D]")
+
+
+def age_group(series: pd.Series, today: date) -> pd.Series:
+    days = to_days(series)
+    age = (np.datetime64(today, "D") - days).astype("timedelta64[D]").astype(float) // 365
+    age[np.isnat(days)] = np.nan
+    groups = pd.cut(age, AGE_BINS, labels=AGE_GROUPS, right=False)
+    return pd.Series(groups, index=series.index, name=series.name).astype(object)
+
+
+def month(series: pd.Series) -> pd.Series:
+    days = to_days(series)
+    # Few distinct months, so only those are formatted.
+    distinct, inverse = np.unique(days.astype("datetime64[M]"), return_inverse=True)
+    labels = np.array([None if np.isnat(value) else str(value) for value in distinct], dtype=object)
+    return pd.Series(labels[inverse.ravel()], index=series.index, name=series.name)
+
+
+def bucket(series: pd.Series) -> pd.Series:
+    # Floors each value to its leading digit: 4857.06 -> 4000, 0.92 -> 0.9.
+    values = pd.to_numeric(series, errors="coerce").to_numpy(dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        magnitude = 10 ** np.floor(np.log10(np.abs(values)))
+        floored = np.where(values == 0, 0.0, np.floor(values / magnitude) * magnitude)
+    bucketed = pd.Series(np.round(floored, 10), index=series.index, name=series.name)
+    if pd.api.types.is_integer_dtype(series):
+        bucketed = bucketed.astype(series.dtype)
+    return bucketed
+
+
+def plan_masking(sample: pd.DataFrame, result) -> Dict[str, str]:
+    # Maps each column that needs a transform to it; unlisted columns pass through.
+    excluded = {str(column).strip().lower() for column in result.excluded_columns}
+    generalize = (
+        result.classification in CLASSIFICATION_ORDER
+        and CLASSIFICATION_ORDER.index(result.classification) >= CLASSIFICATION_ORDER.index(GENERALIZE_FROM)
+    )
+    plan = {}
+    for column in sample.columns:
+        rule, _ = match_column(column, sample[column])
+        rule_name = rule.name if rule else None
+        if str(column).lower() in excluded:
+            plan[column] = EXCLUDED_TRANSFORMS.get(rule_name, DROP)
+        elif generalize and "date" in str(column).lower():
+            plan[column] = MONTH
+        elif generalize and rule_name == "financial" and pd.api.types.is_numeric_dtype(sample[column]):
+            plan[column] = BUCKET
+    return plan
+
+
+def apply_masking(chunk: pd.DataFrame, plan: Dict[str, str], hash_key: Optional[str] = None,
+                  today: Optional[date] = None) -> pd.DataFrame:
+    hash_key = hash_key or load_key()
+    today = today or date.today()
+    masked = {}
+    for column in chunk.columns:
+        transform = plan.get(column)
+        series = chunk[column]
+        if transform == DROP:
+            continue
+        if transform == TOKENIZE:
+            series = tokenize(series, hash_key)
+        elif transform == TRUNCATE_EMAIL:
+            series = truncate_email(series)
+        elif transform == TRUNCATE_PHONE:
+            series = truncate_phone(series)
+        elif transform == AGE_GROUP:
+            series = age_group(series, today)
+        elif transform == MONTH:
+            series = month(series)
+        elif transform == BUCKET:
+            series = bucket(series)
+        masked[column] = series
+    return pd.DataFrame(masked, index=chunk.index)
+
+
+class Masker:
+    # Chunk transform with the key and reference date fixed once, so every chunk
+    # of an export is masked consistently.
+    def __init__(self, plan: Dict[str, str], hash_key: Optional[str] = None, today: Optional[date] = None):
+        self.plan = plan
+        self.hash_key = hash_key or load_key()
+        self.today = today or date.today()
+
+    def __call__(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        return apply_masking(chunk, self.plan, self.hash_key, self.today)
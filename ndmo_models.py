@@ -0,0 +1,24 @@
+from pydantic import BaseModel
+from typing import List
+
+# NDMO Data Classification Policy, Table 1: each classification level maps to one impact level.
+IMPACT_TO_CLASSIFICATION = {
+    "None": "Public",
+    "Low": "Restricted",
+    "Medium": "Secret",
+    "High": "Top Secret",
+}
+
+# Impact levels and classification levels from least to most severe.
+IMPACT_ORDER = ["None", "Low", "Medium", "High"]
+CLASSIFICATION_ORDER = ["Public", "Restricted", "Secret", "Top Secret"]
+
+
+class ClassificationMetadata(BaseModel):
+    classification: str
+    impact_category: str
+    impact_level: str
+    excluded_columns: List[str]
+    justification: str
+    ndmo_reference: str
+
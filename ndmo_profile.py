@@ -0,0 +1,33 @@
+# Per-column profiles sent to the LLM instead of raw rows, so the prompt size
+# depends on the number of columns and not on the number of rows.
+import pandas as pd
+from typing import List, Dict, Any
+
+from ndmo_rules import value_hit_rates
+
+PROFILE_EXAMPLE_VALUES = 3
+
+
+def profile_column(series: pd.Series) -> Dict[str, Any]:
+    total = len(series)
+    non_null = series.dropna()
+    examples = non_null.drop_duplicates().head(PROFILE_EXAMPLE_VALUES).astype(str).tolist()
+    return {
+        "column": str(series.name),
+        "dtype": str(series.dtype),
+        "null_ratio": round(1 - len(non_null) / total, 4) if total else 0.0,
+        "cardinality": int(non_null.nunique()),
+        "pattern_hit_rates": {key: round(rate, 4) for key, rate in value_hit_rates(series).items()},
+        "examples": examples,
+    }
+
+
+def profile_dataframe(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    return [profile_column(df[column]) for column in df.columns]
+
+
+def project_safe_dataset(df: pd.DataFrame, excluded_columns: List[str]) -> pd.DataFrame:
+    # The model may echo column names with different casing; match them case-insensitively.
+    excluded = {str(column).strip().lower() for column in excluded_columns}
+    keep = [column for column in df.columns if str(column).lower() not in excluded]
+    return df[keep]
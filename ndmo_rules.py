@@ -0,0 +1,155 @@
+# Local rule-based NDMO classifier. Known schemas are classified from column
+# names, dtypes and value patterns; Gemini is only needed when confidence is low.
+import re
+import pandas as pd
+from typing import NamedTuple, Optional, Tuple, List
+
+from ndmo_models import ClassificationMetadata, IMPACT_TO_CLASSIFICATION, IMPACT_ORDER
+
+# Below this confidence the caller should fall back to the LLM classifier.
+RULES_CONFIDENCE_THRESHOLD = 0.8
+
+# Confidence for a column matched by name, and the cap for one matched by its values only.
+NAME_MATCH_CONFIDENCE = 0.95
+VALUE_MATCH_CONFIDENCE = 0.9
+# Names like *_status or *_type say little about the content ("HIV_Status",
+# "Religion_Type"), so a match on them alone leaves the decision to the LLM.
+GENERIC_MATCH_CONFIDENCE = 0.6
+
+# Share of non-null values that must match a value pattern for a column to be flagged.
+VALUE_HIT_THRESHOLD = 0.9
+VALUE_SAMPLE_ROWS = 1000
+
+VALUE_PATTERNS = {
+    "email": r"[\w.+-]+@[\w-]+(\.[\w-]+)+",
+    "phone": r"\+?(?=[\d\s().x+-]*[\s().+-])[\d\s().x+-]{7,}",
+    "national_id": r"\d{10}",
+    "account_number": r"(SA\d{22}|\d{12,16})",
+}
+
+PII_REFERENCE = "NDMO Data Classification Policy, Table 1 - Restricted: Personally Identifiable Information (PII)"
+
+
+class ColumnRule(NamedTuple):
+    name: str
+    name_pattern: Optional[str]
+    value_pattern: Optional[str]
+    impact_category: str
+    impact_level: str
+    exclude: bool
+    reference: str
+    confidence: float = NAME_MATCH_CONFIDENCE
+
+
+# Checked in order; the first matching rule wins, so specific rules come before
+# the generic ones. Name patterns run on snake_case names and are anchored on
+# "_" so they do not match inside other words ("event" in "prevention").
+COLUMN_RULES = [
+    ColumnRule("national_id", r"national_?id|iqama|(^|_)(nin|ssn)$", "national_id",
+               "Individuals", "Low", True, PII_REFERENCE),
+    ColumnRule("account_number", r"account_?(number|no|num)|iban|card_?number", "account_number",
+               "Individuals", "Low", True, PII_REFERENCE),
+    ColumnRule("email", r"e_?mail", "email",
+               "Individuals", "Low", True, PII_REFERENCE),
+    ColumnRule("phone", r"phone|mobile|(^|_)tel(ephone)?$", "phone",
+               "Individuals", "Low", True, PII_REFERENCE),
+    ColumnRule("person_name", r"^((full|customer|patient|first|last|doctor|employee|citizen)_)?name$", None,
+               "Individuals", "Low", True, PII_REFERENCE),
+    ColumnRule("person_id", r"(patient|customer|employee|citizen|user)_?id$", None,
+               "Individuals", "Low", True, PII_REFERENCE),
+    ColumnRule("birth_date", r"date_of_birth|(^|_)dob$|birth_?date", None,
+               "Individuals", "Low", True, PII_REFERENCE),
+    ColumnRule("address", r"address|street|postal_?code|zip_?code", None,
+               "Individuals", "Low", True, PII_REFERENCE),
+    ColumnRule("free_text", r"(^|_)(complaint|comments?|notes?|description|feedback|remarks)$", None,
+               "Individuals", "Low", True, "NDMO Data Classification Policy, Table 1 - Restricted: free text may contain PII"),
+    ColumnRule("medical",
+               r"(^|_)(diagnosis|disease|medication|treatment|condition|recovery|admission|discharge|hiv|blood"
+               r"|allerg(y|ies)|symptoms?|vaccinations?|prescriptions?|vitals?|pulse)(_|$)|body_?temperature",
+               None, "Individuals", "Low", False,
+               "NDMO Data Classification Policy, Table 1 - Restricted: information on an individual's medical file"),
+    ColumnRule("municipal",
+               r"(^|_)(event|traffic|permit|utility|complaint)(_|$)|^(temperature|humidity)(_(c|f|percent|pct))?$|(^|_)weather(_|$)",
+               None, "National Interest", "None", False,
+               "NDMO Data Classification Policy, Table 1 - Public: information on public services"),
+    ColumnRule("financial",
+               r"(^|_)(balance|amount|credit|loan|salary|transaction)(_|$)|risk_?score|^account_type$",
+               None, "Individuals", "Low", False,
+               "NDMO Data Classification Policy, Table 1 - Restricted: detailed statements of individual transactions"),
+    ColumnRule("demographic", r"gender|(^|_)sex$|age_?group|(^|_)age$|nationality|religion|ethnicity", None,
+               "Individuals", "Low", False, "NDMO Data Classification Policy, Table 1 - Restricted: Interests of individuals (privacy)"),
+    ColumnRule("public_place", r"(^|_)(city|region|branch|hospital)(_|$)|^report_date$", None,
+               "Entity Activities", "None", False, "NDMO Data Classification Policy, Table 1 - Public: national statistics and public services"),
+    ColumnRule("general", r"(^|_)location$|(^|_)(type|status|level|date|count|rate)$", None,
+               "Entity Activities", "None", False, "NDMO Data Classification Policy, Table 1 - Public: national statistics and public services",
+               GENERIC_MATCH_CONFIDENCE),
+]
+
+def normalize_column_name(column):
+    name = re.sub(r"(?<=[a-z0-9])(?=[A-Z])", "_", str(column).strip())
+    return re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_")
+
+
+def value_hit_rates(series: pd.Series):
+    values = series.dropna().head(VALUE_SAMPLE_ROWS).astype(str).str.strip()
+    if values.empty:
+        return {key: 0.0 for key in VALUE_PATTERNS}
+    return {key: float(values.str.fullmatch(pattern).mean()) for key, pattern in VALUE_PATTERNS.items()}
+
+
+def match_column(column, series: pd.Series) -> Tuple[Optional[ColumnRule], float]:
+    normalized = normalize_column_name(column)
+    for rule in COLUMN_RULES:
+        if rule.name_pattern and re.search(rule.name_pattern, normalized):
+            return rule, rule.confidence
+
+    # Unknown column name: look for identifier-shaped values instead.
+    if series.dtype == object or pd.api.types.is_integer_dtype(series) or pd.api.types.is_string_dtype(series):
+        rates = value_hit_rates(series)
+        for rule in COLUMN_RULES:
+            if rule.value_pattern and rates[rule.value_pattern] >= VALUE_HIT_THRESHOLD:
+                return rule, VALUE_MATCH_CONFIDENCE * rates[rule.value_pattern]
+    return None, 0.0
+
+
+def classify_with_rules(df: pd.DataFrame) -> Tuple[ClassificationMetadata, float]:
+    matches = {column: match_column(column, df[column]) for column in df.columns}
+    confidence = min((conf for _, conf in matches.values()), default=0.0)
+
+    # Unknown columns are treated as "Restricted" until classified (Policy section 1.4).
+    unknown = [column for column, (rule, _) in matches.items() if rule is None]
+    levels = {
+        column: rule.impact_level if rule else "Low"
+        for column, (rule, _) in matches.items()
+    }
+    excluded_columns = [column for column, (rule, _) in matches.items() if rule and rule.exclude]
+
+    impact_level = max(levels.values(), key=IMPACT_ORDER.index, default="None")
+    strictest = [column for column, level in levels.items() if level == impact_level]
+    strictest_rules = [matches[column][0] for column in strictest if matches[column][0]]
+    impact_category = strictest_rules[0].impact_category if strictest_rules else "Individuals"
+
+    references: List[str] = []
+    for rule in strictest_rules:
+        if rule.reference not in references:
+            references.append(rule.reference)
+    references.append("NDMO Data Classification Policy, Principle 4: Highest Level of Protection")
+
+    justification = (
+        f"Rule-based classification of {len(df.columns)} columns. "
+        f"Highest impact level is {impact_level}, found in {len(strictest)} column(s). "
+    )
+    if excluded_columns:
+        justification += f"Excluded columns holding personal identifiers or free text: {', '.join(excluded_columns)}. "
+    if unknown:
+        justification += f"Unrecognized columns treated as Restricted: {', '.join(unknown)}."
+
+    result = ClassificationMetadata(
+        classification=IMPACT_TO_CLASSIFICATION[impact_level],
+        impact_category=impact_category,
+        impact_level=impact_level,
+        excluded_columns=excluded_columns,
+        justification=justification.strip(),
+        ndmo_reference="; ".join(references),
+    )
+    return result, confidence
@@ -0,0 +1,458 @@
+# Request path for the NDMO portal: dataset lookup, classification and audit
+# logging. Kept free of UI code and of import-time client construction so the
+# app starts quickly and these functions can be reused outside Streamlit.
+import json
+import logging
+import os
+from datetime import datetime
+
+from pydantic import ValidationError
+
+import clients
+import telemetry
+from model_gateway import get_gateway
+from model_scheduler import BATCH, priority as model_priority
+from ndmo_models import ClassificationMetadata
+from ndmo_rules import classify_with_rules, RULES_CONFIDENCE_THRESHOLD
+from ndmo_profile import profile_dataframe, project_safe_dataset
+from ndmo_masking import Masker, plan_masking
+from row_sampler import sample_rows
+from classification_cache import ClassificationCache, dataset_fingerprint, cache_key
+from dataset_cache import DatasetCache
+from dataset_catalog import DatasetCatalog
+from audit_logger import AuditLogger, BigQuerySink
+from intent_router import IntentRouter
+from request_history import BigQueryHistoryStore, RequestHistoryStore
+from incremental_json import IncrementalJSONObject
+from job_queue import APPROVED, CLASSIFYING, FAILED, FETCHING, JobQueue
+from sharding import classify_sharded
+from safe_export import EXPORT_CHUNK_ROWS, SafeExport
+from singleflight import SingleFlight
+from streaming import LARGE_DATASET_BYTES, SAFE_PREVIEW_ROWS, iter_blob_chunks, stream_safe_dataset
+
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+GCP_PROJECT_ID = "nse-gcp-ema-tt-beb55-sbx-1"
+GCP_LOCATION = "us-central1"
+GCP_BUCKET_NAME = "ndmo-data"
+BQ_TABLE_ID = f"{GCP_PROJECT_ID}.falcons_dataset.data_requests"
+
+# "profile" sends per-column profiles to Gemini; "rows" sends a token-budgeted,
+# stratified sample of the rows (see row_sampler).
+LLM_CLASSIFICATION_MODE = "profile"
+CLASSIFIER_MODEL = "gemini-2.5-flash"
+# Bump whenever the prompts or rules change so cached classifications are not reused.
+PROMPT_VERSION = "v4"
+
+# "mask" pseudonymizes, truncates or generalizes sensitive columns (ndmo_masking);
+# "drop" removes excluded columns as before.
+SAFE_DATASET_MODE = "mask"
+
+# Column groups wider than this are classified in separate prompts.
+SHARD_MAX_COLUMNS = 40
+
+# Fixed requester ID (replace with your own default as needed)
+DEFAULT_REQUESTER_ID = 123456
+
+# "sqlite" keeps history in the local cache directory; "bigquery" reads it back
+# from the audit table instead.
+HISTORY_BACKEND = os.environ.get("NDMO_HISTORY_BACKEND", "sqlite")
+
+# --- Shared Clients ---
+# Built on first use and shared by every session in the process.
+
+def get_bigquery_client():
+    return clients.bigquery_client(project=GCP_PROJECT_ID)
+
+def get_storage_client():
+    return clients.storage_client(project=GCP_PROJECT_ID)
+
+def get_classification_cache():
+    return clients.shared("classification_cache", ClassificationCache)
+
+def get_dataset_cache():
+    return clients.shared("dataset_cache", DatasetCache)
+
+def get_classification_flights():
+    return clients.shared("classification_flights", lambda: SingleFlight("classification"))
+
+def get_audit_logger():
+    return clients.shared(
+        "audit_logger",
+        lambda: AuditLogger(BigQuerySink(get_bigquery_client(), BQ_TABLE_ID, ignore_unknown_values=True)),
+    )
+
+def get_history_store():
+    def build():
+        if HISTORY_BACKEND == "bigquery":
+            return BigQueryHistoryStore(get_bigquery_client(), BQ_TABLE_ID)
+        return RequestHistoryStore()
+    return clients.shared("history_store", build)
+
+def start_metrics_exporter():
+    # Prometheus endpoint/file, enabled by NDMO_METRICS_PORT / NDMO_METRICS_FILE.
+    return clients.shared("metrics_exporter", lambda: telemetry.start_exporter() or True)
+
+# --- Functions ---
+
+def get_intent_router():
+    return clients.shared("intent_router", IntentRouter)
+
+def detect_categories(user_input):
+    # Every category mentioned in the query, in the order they appear.
+    return get_intent_router().route(user_input)
+
+def detect_category(user_input):
+    categories = detect_categories(user_input)
+    return categories[0] if categories else None
+
+def get_catalog():
+    # Loaded once per process; metadata refresh and cache warm-up run in the background.
+    def build():
+        catalog = DatasetCatalog(lambda: get_storage_client().bucket(GCP_BUCKET_NAME))
+        catalog.start(warm_up=warm_up_dataset)
+        return catalog
+    return clients.shared("dataset_catalog", build)
+
+def get_dataset_blob(category, generation=None):
+    # Blob handle without a GCS request; None for categories not in the catalog.
+    # With a generation, reads fail instead of returning newer content.
+    entry = get_catalog().get(category)
+    if entry is None:
+        return None
+    return get_storage_client().bucket(GCP_BUCKET_NAME).blob(entry.blob_name, generation=generation)
+
+def fetch_data_from_gcs(category):
+    catalog = get_catalog()
+    entry = catalog.get(category)
+    if entry is None:
+        return None, "Invalid category"
+    try:
+        bucket = get_storage_client().bucket(GCP_BUCKET_NAME)
+        df = get_dataset_cache().load(bucket, entry.blob_name, entry.generation, entry.md5_hash)
+        catalog.record_dataset(category, df)
+        return df, "Success"
+    except Exception as e:
+        return None, f"Error fetching data: {e}"
+
+def warm_up_dataset(category):
+    # Fills the dataset and classification caches ahead of the first request.
+    # Its model calls yield to interactive ones.
+    with model_priority(BATCH):
+        df, _ = fetch_data_from_gcs(category)
+        if df is not None and not df.empty:
+            result = classify_dataset(df)
+            if result is not None:
+                get_catalog().record_classification(category, result)
+
+CLASSIFY_CONTENTS = ["Analyze the provided data and generate the classification report."]
+
+def classification_config(prompt: str, schema):
+    from google.genai import types
+    tools = [
+        types.Tool(
+            retrieval=types.Retrieval(
+                vertex_rag_store=types.VertexRagStore(
+                    rag_resources=[
+                        types.VertexRagStoreRagResource(
+                            rag_corpus="projects/997601944772/locations/us-central1/ragCorpora/4611686018427387904"
+                        )
+                    ]
+                )
+            )
+        )
+    ]
+    return types.GenerateContentConfig(
+        system_instruction=[prompt],
+        tools=tools,
+        response_json_schema=schema.model_json_schema(),
+        response_mime_type="application/json"
+    )
+
+class ClassificationError(ValueError):
+    pass
+
+def validate_classification(text: str, schema):
+    # Runs on worker and shard threads, which cannot write to the page. The
+    # error fails the request's job, and its message is shown from the script thread.
+    try:
+        with telemetry.span("validation"):
+            return schema.model_validate_json(text)
+    except ValidationError as e:
+        logger.warning("Invalid classification response: %s\n%s", e, text)
+        raise ClassificationError(
+            f"The classification response was invalid ({e.error_count()} error(s)). Please try again."
+        ) from e
+
+def generate_classification(prompt: str, schema):
+    response = get_gateway(GCP_PROJECT_ID).generate(
+        CLASSIFIER_MODEL, CLASSIFY_CONTENTS, config=classification_config(prompt, schema)
+    )
+    return validate_classification(response.text, schema)
+
+def generate_classification_stream(prompt: str, schema, on_field, cancel_event=None):
+    # Streams the response and reports each top-level field as soon as it is
+    # complete. Setting cancel_event stops reading and closes the stream.
+    parser = IncrementalJSONObject()
+    text = ""
+    stream = get_gateway(GCP_PROJECT_ID).generate_stream(
+        CLASSIFIER_MODEL, CLASSIFY_CONTENTS, config=classification_config(prompt, schema)
+    )
+    try:
+        for chunk in stream:
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            piece = chunk.text or ""
+            text += piece
+            for name, value in parser.feed(piece):
+                on_field(name, value)
+    finally:
+        stream.close()
+    return validate_classification(text, schema)
+
+def profile_prompt(df):
+    with telemetry.span("json_serialize"):
+        profile_text = json.dumps(profile_dataframe(df))
+    prompt = f"""
+    Assume you are a data classifier. Classify the data based on NDMO policy.
+    You are given a profile of each column (dtype, null ratio, cardinality,
+    regex hit rates for common identifiers and a few example values), not the rows.
+    Return JSON with:
+    {{
+      "classification": "<Level>",
+      "impact_category": "<Category>",
+      "impact_level": "<High/Medium/Low/None>",
+      "excluded_columns": ["<Column1>", ...],
+      "justification": "<Why>",
+      "ndmo_reference": "<Policy section>"
+    }}
+    column profile: {profile_text}
+    """
+    return prompt
+
+def classify_ndmo_profile(df, on_field=None, cancel_event=None):
+    # Only the per-column profile is sent; the safe dataset is built from the
+    # data when it is previewed or exported.
+    prompt = profile_prompt(df)
+    if on_field is None:
+        return generate_classification(prompt, ClassificationMetadata)
+    return generate_classification_stream(prompt, ClassificationMetadata, on_field, cancel_event)
+
+def classify_rows(df):
+    # The rows sent are a sample that fits ROW_TOKEN_BUDGET, so the prompt does
+    # not grow with the dataset.
+    with telemetry.span("row_sampling"):
+        sample = sample_rows(df)
+    telemetry.count("sampled_rows", len(sample))
+    with telemetry.span("json_serialize"):
+        rows_text = sample.to_json(orient="records", date_format="iso")
+    prompt = f"""
+    Assume you are a data classifier. Classify the data based on NDMO policy.
+    You are given {len(sample)} of the dataset's {len(df)} rows, chosen to include
+    every value of its categorical columns, every common pattern of missing values
+    and the smallest and largest value of each numeric column.
+    Return JSON with:
+    {{
+      "classification": "<Level>",
+      "impact_category": "<Category>",
+      "impact_level": "<High/Medium/Low/None>",
+      "excluded_columns": ["<Column1>", ...],
+      "justification": "<Why>",
+      "ndmo_reference": "<Policy section>"
+    }}
+    entity data: {rows_text}
+    """
+    return generate_classification(prompt, ClassificationMetadata)
+
+def classify_with_llm(df, on_field=None, cancel_event=None):
+    # Datasets larger than one prompt are split and the shards classified concurrently.
+    if LLM_CLASSIFICATION_MODE == "profile":
+        if on_field is not None and len(df.columns) <= SHARD_MAX_COLUMNS:
+            return classify_ndmo_profile(df, on_field, cancel_event)
+        return classify_sharded(df, classify_ndmo_profile, max_columns=SHARD_MAX_COLUMNS)
+    return classify_sharded(df, classify_rows, max_columns=SHARD_MAX_COLUMNS)
+
+def classify_dataset(df, on_field=None, cancel_event=None):
+    # on_field(name, value) is called for each metadata field as soon as it is
+    # known: streamed from Gemini when possible, otherwise once the result is ready.
+    emitted = set()
+
+    def emit(name, value):
+        emitted.add(name)
+        on_field(name, value)
+
+    cache = get_classification_cache()
+    # Datasets loaded from GCS carry their blob generation; anything else is hashed.
+    fingerprint = df.attrs.get("fingerprint") or dataset_fingerprint(df)
+    key = cache_key(fingerprint, CLASSIFIER_MODEL, f"{PROMPT_VERSION}:{LLM_CLASSIFICATION_MODE}")
+    result = cache.get(key)
+    telemetry.count("classification_cache_hits" if result is not None else "classification_cache_misses")
+    if result is None:
+        def compute():
+            # Known schemas are classified locally; Gemini is only called when the rules are unsure.
+            with telemetry.span("rules"):
+                computed, confidence = classify_with_rules(df)
+            if confidence < RULES_CONFIDENCE_THRESHOLD:
+                computed = classify_with_llm(df, emit if on_field else None, cancel_event)
+            if computed is not None:
+                cache.put(key, computed)
+            cancelled = cancel_event is not None and cancel_event.is_set()
+            return computed, cancelled
+
+        # Sessions asking about the same dataset version at the same time share
+        # one classification. If it was cancelled by the session that ran it,
+        # the others run their own.
+        flights = get_classification_flights()
+        result, cancelled = flights.do(key, compute)
+        if cancelled and not (cancel_event is not None and cancel_event.is_set()):
+            result = cache.get(key)
+            if result is None:
+                result, _ = compute()
+
+    if result is not None and on_field is not None:
+        for name, value in result.model_dump().items():
+            if name not in emitted:
+                on_field(name, value)
+    return result
+
+def safe_transform(result, sample):
+    # The chunk transform producing the safe dataset, planned from the
+    # classification and a sample of the data.
+    if SAFE_DATASET_MODE == "mask":
+        return Masker(plan_masking(sample, result))
+    return lambda chunk: project_safe_dataset(chunk, result.excluded_columns)
+
+def stream_classify_from_gcs(blob):
+    # Large blobs never become a full DataFrame: the first chunk is classified
+    # and previewed. Returns the chunk transform as well, so the export (which
+    # streams the blob again on demand) matches the preview.
+    transforms = []
+
+    def make_transform(metadata, first_chunk):
+        transforms.append(safe_transform(metadata, first_chunk))
+        return transforms[0]
+
+    try:
+        with telemetry.span("stream_classify"):
+            result, preview = stream_safe_dataset(
+                iter_blob_chunks(blob), classify_dataset, make_transform=make_transform
+            )
+        return result, preview, transforms[0] if transforms else None, "Success"
+    except Exception as e:
+        return None, None, None, f"Error streaming data: {e}"
+
+def fetch_and_classify(category, on_field=None, cancel_event=None, on_status=None):
+    # Returns (result, safe_preview, export, status, metrics) for one dataset,
+    # taking the streaming path for blobs too large to load in memory. export is
+    # a SafeExport that builds the download only when asked; metrics is the
+    # request's trace summary: per-stage milliseconds and counters.
+    # on_status(stage) is called with job_queue.FETCHING and CLASSIFYING.
+    with telemetry.trace() as trace:
+        with telemetry.span("request"):
+            outcome = fetch_and_classify_traced(category, on_field, cancel_event, on_status or (lambda stage: None))
+    return (*outcome, trace.summary())
+
+def fetch_and_classify_traced(category, on_field, cancel_event, on_status):
+    catalog = get_catalog()
+    catalog.record_request(category)
+    entry = catalog.get(category)
+    on_status(FETCHING)
+    # The size comes from the catalog, so choosing a path costs no GCS call.
+    if entry is not None and (entry.byte_size or 0) > LARGE_DATASET_BYTES:
+        generation = entry.generation
+        # Chunks are fetched and classified together on this path.
+        on_status(CLASSIFYING)
+        result, safe_preview, transform, status = stream_classify_from_gcs(get_dataset_blob(category, generation))
+        if result is None:
+            return None, None, None, status
+        export = SafeExport(lambda: iter_blob_chunks(get_dataset_blob(category, generation)), transform)
+    else:
+        df, status = fetch_data_from_gcs(category)
+        if df is None:
+            return None, None, None, status
+        if df.empty:
+            return None, None, None, "Dataset is empty"
+        telemetry.count("rows_processed", len(df))
+        on_status(CLASSIFYING)
+        result = classify_dataset(df, on_field, cancel_event)
+        if result is None:
+            return None, None, None, status
+        # The export re-reads this version from the local Arrow copy in chunks,
+        # so nothing beyond the preview is kept in memory for the download.
+        blob_name, generation = entry.blob_name, df.attrs.get("generation")
+        transform = safe_transform(result, df)
+        safe_preview = transform(df.head(SAFE_PREVIEW_ROWS))
+        export = SafeExport(
+            lambda: get_dataset_cache().iter_batches(GCP_BUCKET_NAME, blob_name, generation, EXPORT_CHUNK_ROWS),
+            transform,
+        )
+    catalog.record_classification(category, result)
+    return result, safe_preview, export, status
+
+def record_request(request_id, category, result, metrics=None, requester=DEFAULT_REQUESTER_ID):
+    # Audit row and history entry for a classified request.
+    log_request_to_bigquery(
+        request_id=request_id,
+        requester=requester,
+        classification=result.classification,
+        justification=result.justification,
+        category=category,
+        metrics=metrics,
+    )
+    get_history_store().add(
+        request_id=request_id,
+        requester=requester,
+        category=category,
+        classification=result.classification,
+        justification=result.justification,
+    )
+
+def run_request_job(job):
+    # Worker side of submit_request: streamed metadata fields are published on
+    # the ticket as they arrive, and the job's cancel_event stops the model call.
+    # Errors (e.g. ClassificationError) fail the job with their message.
+    category = job.payload
+    outcome = fetch_and_classify(
+        category,
+        on_field=lambda name, value: job.update(fields={name: value}),
+        cancel_event=job.cancel_event,
+        on_status=job.update,
+    )
+    result, _, _, status, metrics = outcome
+    if status != "Success":
+        job.finish(FAILED, f"Failed to fetch data: {status}", outcome)
+    elif result is None:
+        message = "Cancelled" if job.cancel_event.is_set() else "Classification failed. Please try again."
+        job.finish(FAILED, message, outcome)
+    else:
+        record_request(job.ticket_id, category, result, metrics)
+        job.finish(APPROVED, "Classification complete", outcome)
+
+def get_job_queue():
+    return clients.shared("job_queue", lambda: JobQueue(run_request_job))
+
+def submit_request(category, request_id):
+    # Returns the queued ticket at once; poll get_job_queue().get(request_id)
+    # or wait() on it for progress. The finished job's result is the
+    # fetch_and_classify tuple.
+    return get_job_queue().submit(request_id, category)
+
+def log_request_to_bigquery(request_id, requester, classification, justification, category, metrics=None):
+    MAX_LENGTH = 255
+    now = datetime.utcnow()
+    now_iso = now.isoformat()
+    row = {
+        "request_id": int(request_id),
+        "requester": int(requester),
+        "classification": str(classification)[:MAX_LENGTH],
+        "request_time": now_iso,
+        "decision_time": now_iso,
+        "decision": str(justification)[:MAX_LENGTH],
+        "requested_data": str(category)[:MAX_LENGTH]
+    }
+    if metrics is not None:
+        # Needs a STRING `metrics` column; without one the field is ignored.
+        row["metrics"] = json.dumps(metrics, separators=(",", ":"))
+    # Written in the background; failures are retried and journaled by the logger.
+    get_audit_logger().log(row)
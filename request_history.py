@@ -0,0 +1,198 @@
+# Persistent request history. Rows are appended once and read newest first in
+# pages, using a (created_at, request_id) cursor instead of OFFSET so every page
+# costs the same however long the history grows. Page queries are cached until
+# the next write.
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional
+
+from classification_cache import CACHE_DIR
+
+HISTORY_PAGE_SIZE = 25
+MAX_CACHED_PAGES = 128
+MAX_FIELD_LENGTH = 255
+# Audit rows reach BigQuery after add() is called (see audit_logger), so cached
+# BigQuery pages also expire after this long.
+BIGQUERY_PAGE_TTL_SECONDS = 30
+
+
+class HistoryCursor(NamedTuple):
+    created_at: float
+    request_id: int
+
+
+class HistoryPage(NamedTuple):
+    rows: List[Dict]
+    # Pass as `before` to get the next (older) page; None on the last page.
+    next_cursor: Optional[HistoryCursor]
+
+
+class PageCache:
+    # LRU of history pages by (requester, before, limit), cleared on every write.
+    def __init__(self, max_pages: int = MAX_CACHED_PAGES, ttl_seconds: Optional[float] = None):
+        self.max_pages = max_pages
+        self.ttl_seconds = ttl_seconds
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Optional[HistoryPage]:
+        with self._lock:
+            entry = self._pages.get(key)
+            if entry is None:
+                return None
+            stored_at, page = entry
+            if self.ttl_seconds is not None and time.monotonic() - stored_at > self.ttl_seconds:
+                del self._pages[key]
+                return None
+            self._pages.move_to_end(key)
+            return page
+
+    def put(self, key, page: HistoryPage):
+        with self._lock:
+            self._pages[key] = (time.monotonic(), page)
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+
+
+class RequestHistoryStore:
+    def __init__(self, path: Optional[str] = None, max_cached_pages: int = MAX_CACHED_PAGES):
+        self._pages = PageCache(max_cached_pages)
+        self._lock = threading.Lock()
+        if path is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            path = os.path.join(CACHE_DIR, "request_history.sqlite")
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS request_history (
+                request_id INTEGER NOT NULL,
+                requester INTEGER NOT NULL,
+                category TEXT NOT NULL,
+                classification TEXT,
+                justification TEXT,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_request_history_created ON request_history (created_at, request_id)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_request_history_requester "
+            "ON request_history (requester, created_at, request_id)"
+        )
+        self._db.commit()
+
+    def add(self, request_id: int, requester: int, category: str, classification: str,
+            justification: str, created_at: Optional[float] = None):
+        created_at = time.time() if created_at is None else created_at
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO request_history VALUES (?, ?, ?, ?, ?, ?)",
+                (int(request_id), int(requester), str(category)[:MAX_FIELD_LENGTH],
+                 str(classification)[:MAX_FIELD_LENGTH], str(justification)[:MAX_FIELD_LENGTH], created_at),
+            )
+            self._db.commit()
+            # Any cached page may now be stale.
+            self._pages.clear()
+
+    def page(self, requester: Optional[int] = None, before: Optional[HistoryCursor] = None,
+             limit: int = HISTORY_PAGE_SIZE) -> HistoryPage:
+        key = (requester, before, limit)
+        cached = self._pages.get(key)
+        if cached is not None:
+            return cached
+        with self._lock:
+            conditions, params = [], []
+            if requester is not None:
+                conditions.append("requester = ?")
+                params.append(int(requester))
+            if before is not None:
+                conditions.append("(created_at, request_id) < (?, ?)")
+                params.extend(before)
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+            # One extra row tells whether an older page exists.
+            cursor = self._db.execute(
+                f"""
+                SELECT request_id, requester, category, classification, justification, created_at
+                FROM request_history {where}
+                ORDER BY created_at DESC, request_id DESC
+                LIMIT ?
+                """,
+                (*params, limit + 1),
+            )
+            columns = [description[0] for description in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            next_cursor = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                next_cursor = HistoryCursor(rows[-1]["created_at"], rows[-1]["request_id"])
+            result = HistoryPage(rows, next_cursor)
+            self._pages.put(key, result)
+            return result
+
+
+class BigQueryHistoryStore:
+    # Read-only view of the audit table written by audit_logger. add() writes
+    # nothing because every request is already logged there; it only drops the
+    # cached pages. Pages come back with the same cursor scheme, using
+    # request_time in place of created_at.
+    def __init__(self, client, table_id: str, max_cached_pages: int = MAX_CACHED_PAGES):
+        self.client = client
+        self.table_id = table_id
+        self._pages = PageCache(max_cached_pages, BIGQUERY_PAGE_TTL_SECONDS)
+
+    def add(self, *args, **kwargs):
+        self._pages.clear()
+
+    def page(self, requester: Optional[int] = None, before: Optional[HistoryCursor] = None,
+             limit: int = HISTORY_PAGE_SIZE) -> HistoryPage:
+        key = (requester, before, limit)
+        cached = self._pages.get(key)
+        if cached is not None:
+            return cached
+
+        from datetime import datetime, timezone
+        from google.cloud import bigquery
+
+        conditions, params = [], []
+        if requester is not None:
+            conditions.append("requester = @requester")
+            params.append(bigquery.ScalarQueryParameter("requester", "INT64", int(requester)))
+        if before is not None:
+            conditions.append(
+                "(CAST(request_time AS TIMESTAMP) < @before_time"
+                " OR (CAST(request_time AS TIMESTAMP) = @before_time AND request_id < @before_id))"
+            )
+            before_time = datetime.fromtimestamp(before.created_at, timezone.utc)
+            params.append(bigquery.ScalarQueryParameter("before_time", "TIMESTAMP", before_time))
+            params.append(bigquery.ScalarQueryParameter("before_id", "INT64", before.request_id))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = f"""
+            SELECT request_id, requester, requested_data AS category, classification,
+                   decision AS justification, CAST(request_time AS TIMESTAMP) AS request_time
+            FROM `{self.table_id}` {where}
+            ORDER BY request_time DESC, request_id DESC
+            LIMIT {int(limit) + 1}
+        """
+        job_config = bigquery.QueryJobConfig(query_parameters=params)
+        rows = []
+        for row in self.client.query(query, job_config=job_config).result():
+            row = dict(row.items())
+            row["created_at"] = row.pop("request_time").timestamp()
+            rows.append(row)
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = HistoryCursor(rows[-1]["created_at"], rows[-1]["request_id"])
+        result = HistoryPage(rows, next_cursor)
+        self._pages.put(key, result)
+        return result
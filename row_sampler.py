@@ -0,0 +1,131 @@
+# Token-budgeted row samples for prompts that need raw rows. Instead of sending
+# every row, a sample is chosen that covers what the model needs to see (each
+# value of the categorical columns, each null pattern, the extremes of numeric
+# columns) and is topped up with random rows until the budget is spent. Only
+# candidate rows are serialized, so the cost of sampling and the size of the
+# prompt stay flat as the dataset grows.
+import os
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from model_scheduler import CHARS_PER_TOKEN
+
+ROW_TOKEN_BUDGET = int(os.environ.get("NDMO_ROW_TOKEN_BUDGET", "8000"))
+# Columns with more distinct values than this are not stratified on.
+MAX_CATEGORY_VALUES = 50
+CATEGORY_PROBE_ROWS = 10_000
+# Only the most common null patterns get a row of their own.
+MAX_NULL_PATTERNS = 32
+# Fixed, so the same dataset always gives the same sample (and prompt).
+SAMPLE_SEED = 0
+FILL_BATCH_ROWS = 256
+
+
+def row_tokens(df: pd.DataFrame) -> np.ndarray:
+    # Tokens each row costs in to_json(orient="records"), comma included.
+    if df.empty:
+        return np.zeros(0, dtype=np.int64)
+    lines = df.to_json(orient="records", lines=True, date_format="iso").splitlines()
+    return np.fromiter((len(line) + 1 for line in lines), dtype=np.int64, count=len(lines)) // CHARS_PER_TOKEN + 1
+
+
+def categorical_columns(df: pd.DataFrame) -> List[str]:
+    columns = []
+    for column in df.columns:
+        series = df[column]
+        if pd.api.types.is_float_dtype(series) or pd.api.types.is_datetime64_any_dtype(series):
+            continue
+        # Identifier-like columns show themselves in the first rows already.
+        if series.head(CATEGORY_PROBE_ROWS).nunique(dropna=True) > MAX_CATEGORY_VALUES:
+            continue
+        if series.nunique(dropna=True) <= MAX_CATEGORY_VALUES:
+            columns.append(column)
+    return columns
+
+
+def strata(df: pd.DataFrame) -> Tuple[np.ndarray, List[set]]:
+    # Candidate row positions (the first row of each stratum) and, for each, every
+    # stratum it covers: a (column, value) of a categorical column, its null
+    # pattern, or being a numeric column's min or max.
+    categorical = categorical_columns(df)
+    candidates = set()
+    for column in categorical:
+        codes, _ = pd.factorize(df[column], use_na_sentinel=True)
+        candidates.update(np.unique(codes, return_index=True)[1].tolist())
+
+    patterns = None
+    nulls = df.isna()
+    if nulls.to_numpy().any():
+        patterns = pd.util.hash_pandas_object(nulls, index=False).to_numpy()
+        _, first, counts = np.unique(patterns, return_index=True, return_counts=True)
+        candidates.update(first[np.argsort(-counts, kind="stable")[:MAX_NULL_PATTERNS]].tolist())
+
+    extremes = {}
+    for column in df.select_dtypes(include="number").columns:
+        values = df[column].to_numpy(dtype=float, na_value=np.nan)
+        if np.isnan(values).all():
+            continue
+        extremes[column] = (np.nanmin(values), np.nanmax(values))
+        candidates.update((int(np.nanargmin(values)), int(np.nanargmax(values))))
+
+    positions = np.array(sorted(candidates), dtype=np.int64)
+    rows = df.iloc[positions]
+    covered = [set() for _ in positions]
+    for column in categorical:
+        for items, value in zip(covered, rows[column].tolist()):
+            items.add((column, None if pd.isna(value) else value))
+    if patterns is not None:
+        for items, pattern in zip(covered, patterns[positions].tolist()):
+            items.add(("null_pattern", pattern))
+    for column, (low, high) in extremes.items():
+        for items, value in zip(covered, rows[column].tolist()):
+            if value == low:
+                items.add((column, "min"))
+            if value == high:
+                items.add((column, "max"))
+    return positions, covered
+
+
+def sample_rows(df: pd.DataFrame, token_budget: int = ROW_TOKEN_BUDGET) -> pd.DataFrame:
+    # Returns the sampled rows in their original order. Strata rows are chosen
+    # greedily by new strata per token; the remaining budget goes to random rows.
+    # Every row costs at least a token, so only small datasets can go whole.
+    if len(df) <= token_budget and row_tokens(df).sum() <= token_budget:
+        return df
+
+    positions, row_strata = strata(df)
+    costs = row_tokens(df.iloc[positions])
+    uncovered = set().union(*row_strata)
+    chosen, spent = [], 0
+    remaining = list(range(len(positions)))
+    while uncovered and remaining:
+        best, best_score = None, 0.0
+        for index in remaining:
+            gain = len(row_strata[index] & uncovered)
+            score = gain / costs[index]
+            if gain and spent + costs[index] <= token_budget and score > best_score:
+                best, best_score = index, score
+        if best is None:
+            break
+        chosen.append(int(positions[best]))
+        spent += int(costs[best])
+        uncovered -= row_strata[best]
+        remaining.remove(best)
+
+    # Random rows in batches, so only what might fit is serialized.
+    taken = set(chosen)
+    order = np.random.default_rng(SAMPLE_SEED).permutation(len(df))
+    for start in range(0, len(order), FILL_BATCH_ROWS):
+        batch = [int(position) for position in order[start:start + FILL_BATCH_ROWS] if position not in taken]
+        added = False
+        for position, cost in zip(batch, row_tokens(df.iloc[batch])):
+            if spent + cost <= token_budget:
+                chosen.append(position)
+                spent += int(cost)
+                added = True
+        if not added:
+            break
+
+    return df.iloc[sorted(chosen)]
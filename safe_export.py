@@ -0,0 +1,89 @@
+# On-demand export of safe datasets. A SafeExport only remembers where the data
+# comes from and how to make it safe; the file is produced when a download is
+# requested, one chunk at a time, into a spooled temp file that moves to disk
+# once it grows.
+import gzip
+import tempfile
+from typing import Callable, Iterable, NamedTuple
+
+import pandas as pd
+
+import telemetry
+
+EXPORT_CHUNK_ROWS = 50_000
+SPOOL_MAX_BYTES = 64 * 1024 * 1024
+
+
+class ExportFormat(NamedTuple):
+    label: str
+    mime: str
+    extension: str
+
+
+EXPORT_FORMATS = {
+    "csv.gz": ExportFormat("CSV (gzip)", "application/gzip", "csv.gz"),
+    "csv": ExportFormat("CSV", "text/csv", "csv"),
+    "parquet": ExportFormat("Parquet", "application/vnd.apache.parquet", "parquet"),
+}
+
+
+def write_csv(frames: Iterable[pd.DataFrame], sink):
+    for index, frame in enumerate(frames):
+        frame.to_csv(sink, index=False, header=index == 0, encoding="utf-8")
+
+
+def write_parquet(frames: Iterable[pd.DataFrame], sink):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    writer = None
+    try:
+        for frame in frames:
+            if writer is None:
+                table = pa.Table.from_pandas(frame, preserve_index=False)
+                writer = pq.ParquetWriter(sink, table.schema)
+            else:
+                # Later chunks follow the first chunk's schema, e.g. all-null columns.
+                table = pa.Table.from_pandas(frame, schema=writer.schema, preserve_index=False)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def write_export(frames: Iterable[pd.DataFrame], fmt: str, sink):
+    if fmt == "csv":
+        write_csv(frames, sink)
+    elif fmt == "csv.gz":
+        with gzip.GzipFile(fileobj=sink, mode="wb") as compressed:
+            write_csv(frames, compressed)
+    elif fmt == "parquet":
+        write_parquet(frames, sink)
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+
+class SafeExport:
+    # frames() must return a fresh iterable of source chunks on every call;
+    # transform turns one source chunk into its safe form (see ndmo_service.safe_transform).
+    def __init__(self, frames: Callable[[], Iterable[pd.DataFrame]],
+                 transform: Callable[[pd.DataFrame], pd.DataFrame]):
+        self.frames = frames
+        self.transform = transform
+
+    def safe_frames(self):
+        for frame in self.frames():
+            yield self.transform(frame)
+
+    def open(self, fmt: str = "csv.gz"):
+        # Returns a file positioned at the start; the caller closes it.
+        export = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES, mode="w+b")
+        try:
+            with telemetry.span("export"):
+                write_export(self.safe_frames(), fmt, export)
+        except Exception:
+            export.close()
+            raise
+        telemetry.count("bytes_exported", export.tell())
+        export.seek(0)
+        return export
+
@@ -0,0 +1,65 @@
+# Sharded classification for datasets too large for one prompt. Row blocks and
+# column groups are classified concurrently and merged deterministically: the
+# strictest shard decides the level and exclusions are unioned.
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+import pandas as pd
+
+import telemetry
+from ndmo_models import ClassificationMetadata, CLASSIFICATION_ORDER, IMPACT_ORDER
+
+SHARD_MAX_WORKERS = 8
+
+
+def split_shards(df: pd.DataFrame, max_rows: Optional[int] = None,
+                 max_columns: Optional[int] = None) -> List[pd.DataFrame]:
+    row_step = max_rows or max(len(df), 1)
+    column_step = max_columns or max(len(df.columns), 1)
+    shards = []
+    for row_start in range(0, max(len(df), 1), row_step):
+        rows = df.iloc[row_start:row_start + row_step]
+        for column_start in range(0, len(df.columns), column_step):
+            shards.append(rows.iloc[:, column_start:column_start + column_step])
+    return shards
+
+
+def severity(result) -> int:
+    # Unknown labels fall back to the impact level; unclassified data counts as
+    # Restricted (NDMO Data Classification Policy, section 1.4).
+    classification_rank = (
+        CLASSIFICATION_ORDER.index(result.classification)
+        if result.classification in CLASSIFICATION_ORDER else 1
+    )
+    impact_rank = IMPACT_ORDER.index(result.impact_level) if result.impact_level in IMPACT_ORDER else 1
+    return max(classification_rank, impact_rank)
+
+
+def merge_results(df: pd.DataFrame, results) -> ClassificationMetadata:
+    # Results arrive in shard order, so ties always go to the earliest shard.
+    strictest = max(results, key=severity)
+    excluded = {column for result in results for column in result.excluded_columns}
+    excluded_columns = [column for column in df.columns if column in excluded]
+    excluded_columns += sorted(excluded.difference(excluded_columns))
+    return ClassificationMetadata(
+        classification=strictest.classification,
+        impact_category=strictest.impact_category,
+        impact_level=strictest.impact_level,
+        excluded_columns=excluded_columns,
+        justification=strictest.justification,
+        ndmo_reference=strictest.ndmo_reference,
+    )
+
+
+def classify_sharded(df: pd.DataFrame, classify_fn: Callable, max_rows: Optional[int] = None,
+                     max_columns: Optional[int] = None, max_workers: int = SHARD_MAX_WORKERS):
+    shards = split_shards(df, max_rows, max_columns)
+    if len(shards) == 1:
+        return classify_fn(df)
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(shards))) as pool:
+        # A shard that raises fails the whole classification, on the calling thread.
+        results = list(pool.map(telemetry.propagate(classify_fn), shards))
+    # A shard without a decision could hide an identifier, so the merge fails closed.
+    if any(result is None for result in results):
+        return None
+    return merge_results(df, results)
@@ -0,0 +1,53 @@
+# Coalesces identical concurrent work. The first caller for a key runs the
+# function; callers arriving while it is in flight wait for the same outcome,
+# including its exception. Nothing is remembered once the call completes, so
+# results should be cached elsewhere.
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable
+
+import telemetry
+
+_ABANDONED = object()
+
+
+class SingleFlight:
+    def __init__(self, name: str = "single_flight"):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        while True:
+            with self._lock:
+                future = self._calls.get(key)
+                leader = future is None
+                if leader:
+                    future = self._calls[key] = Future()
+            if leader:
+                break
+            telemetry.count(f"{self.name}_shared")
+            result = future.result()
+            if result is not _ABANDONED:
+                return result
+            # The leader's own thread was stopped (e.g. a Streamlit rerun), which
+            # says nothing about the work itself, so the waiters try again.
+
+        try:
+            result = fn()
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        except BaseException:
+            future.set_result(_ABANDONED)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
@@ -0,0 +1,43 @@
+# Chunked ingestion for datasets too large to hold in memory. The blob is read
+# as a stream and every downstream step (classification, masking, export)
+# consumes one bounded chunk at a time.
+import pandas as pd
+
+import telemetry
+from ndmo_profile import project_safe_dataset
+
+STREAM_CHUNK_ROWS = 50_000
+# Blobs above this size skip the in-memory path in the apps.
+LARGE_DATASET_BYTES = 200 * 1024 * 1024
+SAFE_PREVIEW_ROWS = 5
+
+
+def iter_blob_chunks(blob, chunksize: int = STREAM_CHUNK_ROWS):
+    with blob.open("rb") as stream:
+        for chunk in pd.read_csv(stream, chunksize=chunksize):
+            yield chunk
+
+
+def stream_safe_dataset(chunks, classify_fn, make_transform=None):
+    # classify_fn sees only the first chunk; column exclusions are a schema-level
+    # decision, so the transform applies unchanged to the rest of the stream
+    # when it is exported (safe_export.SafeExport). Only the first chunk is read
+    # here, for the preview.
+    # make_transform(metadata, first_chunk) may supply the chunk transform;
+    # by default excluded columns are dropped.
+    chunks = iter(chunks)
+    first = next(chunks, None)
+    if first is None:
+        return None, None
+    metadata = classify_fn(first)
+    if metadata is None:
+        return None, None
+
+    if make_transform is not None:
+        transform = make_transform(metadata, first)
+    else:
+        def transform(chunk):
+            return project_safe_dataset(chunk, metadata.excluded_columns)
+
+    telemetry.count("rows_processed", len(first))
+    return metadata, transform(first).head(SAFE_PREVIEW_ROWS)
@@ -0,0 +1,226 @@
+# Vectorized synthetic data generator for the Bank, Hospital and SmartCity
+# sample datasets, sized for load testing (millions of rows).
+#
+#   python synthetic_data.py hospital --rows 10000000 --seed 42 --output Hospital.parquet
+#
+# Columns are drawn in bulk with NumPy; names, emails and free text come from
+# Faker pools built once per process. Row chunk i always uses the random
+# stream (seed, i), so the output depends only on the seed and the chunk size,
+# not on how many worker processes produced it.
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+CHUNK_ROWS = 500_000
+POOL_SIZE = 5000
+
+ACCOUNT_TYPES = ['Savings', 'Current', 'Business', 'Fixed Deposit']
+TRANSACTION_TYPES = ['Deposit', 'Withdrawal', 'Transfer', 'Bill Payment', 'Loan Payment']
+BRANCHES = ['Riyadh', 'Jeddah', 'Dammam', 'Makkah', 'Madinah']
+LOAN_STATUSES = ['Approved', 'Pending', 'Rejected']
+
+HOSPITALS = ['Riyadh General Hospital', 'Jeddah Medical Center', 'Dammam Health Complex', 'Makkah Specialty Hospital']
+HOSPITAL_REGIONS = ['Central Region', 'Western Region', 'Eastern Region', 'Western Region']
+DOCTORS = ['Dr. Nora Al-Ali', 'Dr. Saeed Al-Harbi', 'Dr. Lina Al-Mutairi', 'Dr. Khaled Al-Qahtani']
+DIAGNOSES = ['Diabetes Type 2', 'Hypertension', 'Asthma', 'Cardiac Arrest', 'Migraine', 'Arthritis']
+DISEASE_NAMES = ['Influenza', 'COVID-19', 'Tuberculosis', 'Hepatitis B', 'Chickenpox', 'Malaria']
+HOSPITAL_CITIES = ['Riyadh', 'Jeddah', 'Dammam', 'Mecca', 'Medina', 'Abha', 'Tabuk', 'Hail']
+GENDERS = ['M', 'F']
+AGE_BINS = [-np.inf, 20, 30, 40, 50, 60, np.inf]
+AGE_GROUPS = ['0-19', '20-29', '30-39', '40-49', '50-59', '60+']
+
+CITIES = ['Riyadh', 'Jeddah', 'Dammam', 'Makkah', 'Madinah', 'Tabuk']
+REGIONS = ['Central', 'Western', 'Eastern', 'Northern', 'Southern']
+COMPLAINT_TYPES = ['Noise', 'Waste', 'Road Damage', 'Water Leak', 'Electricity']
+TRAFFIC_LEVELS = ['Low', 'Moderate', 'High', 'Severe']
+PERMIT_TYPES = ['Construction', 'Business License', 'Event', 'Renovation']
+PERMIT_STATUSES = ['Approved', 'Pending', 'Rejected']
+UTILITY_TYPES = ['Water', 'Electricity', 'Gas']
+
+_pools = {}
+
+
+def faker_pools(seed):
+    # Built once per process and seed; Faker is only needed for these pools.
+    if seed not in _pools:
+        from faker import Faker
+        fake = Faker()
+        fake.seed_instance(seed)
+        _pools[seed] = {
+            "name": np.array([fake.name() for _ in range(POOL_SIZE)], dtype=object),
+            "email": np.array([fake.email() for _ in range(POOL_SIZE)], dtype=object),
+            "phone": np.array([fake.phone_number() for _ in range(POOL_SIZE)], dtype=object),
+            "catch_phrase": np.array([fake.catch_phrase() for _ in range(POOL_SIZE)], dtype=object),
+            "text": np.array([fake.text(max_nb_chars=100) for _ in range(POOL_SIZE)], dtype=object),
+        }
+    return _pools[seed]
+
+
+def pick(rng, values, n):
+    return np.asarray(values, dtype=object)[rng.integers(0, len(values), n)]
+
+
+def days_ago(rng, today, low, high, n):
+    # Dates between `high` and `low` days before today, inclusive.
+    return today - rng.integers(low, high + 1, n).astype("timedelta64[D]")
+
+
+def uniform(rng, low, high, n, decimals=2):
+    return np.round(rng.uniform(low, high, n), decimals)
+
+
+def build_bank(rng, pools, start, n, today):
+    loan_applications = rng.integers(0, 4, n)
+    has_loan = loan_applications > 0
+    return pd.DataFrame({
+        'Customer_Name': pick(rng, pools["name"], n),
+        'Account_Number': rng.integers(10 ** 11, 10 ** 12, n),
+        'Account_Type': pick(rng, ACCOUNT_TYPES, n),
+        'Branch_Location': pick(rng, BRANCHES, n),
+        'Transaction_Type': pick(rng, TRANSACTION_TYPES, n),
+        'Transaction_Amount': uniform(rng, 10, 10000, n),
+        'Transaction_Date': days_ago(rng, today, 0, 365, n),
+        'Loan_Applications': loan_applications,
+        'Loan_Amount': np.where(has_loan, uniform(rng, 1000, 50000, n), 0.0),
+        'Loan_Status': np.where(has_loan, pick(rng, LOAN_STATUSES, n), None),
+        'Credit_Score': rng.integers(300, 851, n),
+        'Aggregated_Credit_Risk_Score': uniform(rng, 0, 1, n),
+        'Account_Balance': uniform(rng, 0, 100000, n),
+        'Email': pick(rng, pools["email"], n),
+        'Phone_Number': pick(rng, pools["phone"], n),
+    })
+
+
+def build_hospital(rng, pools, start, n, today):
+    date_of_birth = days_ago(rng, today, 18 * 365, 80 * 365, n)
+    age = (today - date_of_birth).astype(int) // 365
+    admission_date = days_ago(rng, today, 0, 3 * 365, n)
+    stay_days = (today - admission_date).astype(int)
+    discharge_date = admission_date + np.floor(rng.random(n) * (stay_days + 1)).astype("timedelta64[D]")
+    hospital_index = rng.integers(0, len(HOSPITALS), n)
+    report_year = rng.choice([2023, 2024, 2025], n)
+    report_month = rng.integers(1, 13, n)
+    report_date = pd.to_datetime({"year": report_year, "month": report_month, "day": np.ones(n, dtype=int)})
+    return pd.DataFrame({
+        'Patient_ID': pd.Series(np.arange(start + 1, start + n + 1)).astype(str).str.zfill(3),
+        'Full_Name': pick(rng, pools["name"], n),
+        'National_ID': rng.integers(10 ** 9, 10 ** 10, n),
+        'Date_of_Birth': date_of_birth,
+        'Gender': pick(rng, GENDERS, n),
+        'Diagnosis': pick(rng, DIAGNOSES, n),
+        'Admission_Date': admission_date,
+        'Discharge_Date': discharge_date,
+        'Doctor_Name': pick(rng, DOCTORS, n),
+        'Hospital_Name': np.asarray(HOSPITALS, dtype=object)[hospital_index],
+        'Email': pick(rng, pools["email"], n),
+        'Disease_Name': pick(rng, DISEASE_NAMES, n),
+        'City': pick(rng, HOSPITAL_CITIES, n),
+        'Hospital_Region': np.asarray(HOSPITAL_REGIONS, dtype=object)[hospital_index],
+        'Admission_Count': rng.integers(5, 201, n),
+        'Recovery_Rate': uniform(rng, 85.0, 99.9, n, decimals=1),
+        'Age_Group': pd.cut(age, AGE_BINS, labels=AGE_GROUPS, right=False).astype(str),
+        'Report_Date': report_date.values.astype("datetime64[D]"),
+    })
+
+
+def build_smart_city(rng, pools, start, n, today):
+    return pd.DataFrame({
+        'City': pick(rng, CITIES, n),
+        'Region': pick(rng, REGIONS, n),
+        'Public_Event_Name': pick(rng, pools["catch_phrase"], n),
+        'Event_Date': days_ago(rng, today, -182, 182, n),
+        'Traffic_Report_Date': days_ago(rng, today, 0, 30, n),
+        'Traffic_Level': pick(rng, TRAFFIC_LEVELS, n),
+        'Complaint_Type': pick(rng, COMPLAINT_TYPES, n),
+        'Citizen_Complaint': pick(rng, pools["text"], n),
+        'Complaint_Date': days_ago(rng, today, 0, 365, n),
+        'Permit_Type': pick(rng, PERMIT_TYPES, n),
+        'Permit_Status': pick(rng, PERMIT_STATUSES, n),
+        'Permit_Application_Date': days_ago(rng, today, 0, 365, n),
+        'Utility_Type': pick(rng, UTILITY_TYPES, n),
+        'Utility_Usage_Amount': uniform(rng, 100, 10000, n),
+        'Utility_Report_Date': days_ago(rng, today, 0, 30, n),
+        'Temperature_C': uniform(rng, 15, 45, n, decimals=1),
+        'Humidity_Percent': uniform(rng, 10, 90, n, decimals=1),
+    })
+
+
+BUILDERS = {
+    "bank": build_bank,
+    "hospital": build_hospital,
+    "smart city": build_smart_city,
+}
+
+
+def build_chunk(dataset, seed, index, start, n, today):
+    rng = np.random.default_rng([seed, index])
+    return BUILDERS[dataset](rng, faker_pools(seed), start, n, np.datetime64(today, "D"))
+
+
+def iter_chunks(dataset, rows, seed, chunk_rows=CHUNK_ROWS, workers=None, today=None):
+    # Yields chunks in order. At most 2 * workers chunks are in flight, so memory
+    # stays bounded however many rows are requested.
+    today = today or date.today().isoformat()
+    specs = [(dataset, seed, i, start, min(chunk_rows, rows - start), today)
+             for i, start in enumerate(range(0, rows, chunk_rows))]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(specs) == 1:
+        for spec in specs:
+            yield build_chunk(*spec)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        for spec in specs:
+            pending.append(pool.submit(build_chunk, *spec))
+            if len(pending) >= 2 * workers:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+
+def generate(dataset, rows, output, seed=None, chunk_rows=CHUNK_ROWS, workers=None, today=None):
+    # Writes CSV, or Parquet when `output` ends in .parquet, one chunk at a time.
+    if seed is None:
+        seed = int(np.random.SeedSequence().entropy % (2 ** 32))
+    chunks = iter_chunks(dataset, rows, seed, chunk_rows, workers, today)
+    if output.endswith(".parquet"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        writer = None
+        try:
+            for chunk in chunks:
+                if writer is None:
+                    table = pa.Table.from_pandas(chunk, preserve_index=False)
+                    writer = pq.ParquetWriter(output, table.schema)
+                else:
+                    table = pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+    else:
+        with open(output, "w", newline="", encoding="utf-8") as f:
+            for index, chunk in enumerate(chunks):
+                chunk.to_csv(f, index=False, header=index == 0)
+    return seed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic NDMO sample datasets.")
+    parser.add_argument("dataset", choices=sorted(BUILDERS))
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--output", required=True, help="CSV path, or a .parquet path")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args()
+    seed = generate(args.dataset, args.rows, args.output, args.seed, args.chunk_rows, args.workers)
+    print(f"{args.output} created ({args.rows} rows, seed {seed})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+# In-process tracing and metrics for the request path. Spans time each stage
+# (download, parsing, serialization, model calls, inserts) and counters track
+# tokens, bytes, rows and cache hits. Everything is aggregated process-wide for
+# the Prometheus export, and also per request while a trace() is active.
+import bisect
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DURATION_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0]
+METRICS_PREFIX = "ndmo"
+EXPORT_INTERVAL_SECONDS = 15
+
+_current_trace = contextvars.ContextVar("ndmo_trace", default=None)
+
+
+def rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+        # Peak rather than current RSS where /proc is unavailable.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class StageStats:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.max_rss_growth = 0
+
+    def observe(self, seconds, rss_growth):
+        self.count += 1
+        self.seconds += seconds
+        index = bisect.bisect_left(DURATION_BUCKETS, seconds)
+        if index < len(self.buckets):
+            self.buckets[index] += 1
+        self.max_rss_growth = max(self.max_rss_growth, rss_growth)
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages = {}
+        self.counters = {}
+
+    def observe(self, stage, seconds, rss_growth):
+        with self._lock:
+            self.stages.setdefault(stage, StageStats()).observe(seconds, rss_growth)
+
+    def count(self, name, value):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self):
+        with self._lock:
+            stages = {
+                name: {"count": stats.count, "seconds": stats.seconds, "max_rss_growth": stats.max_rss_growth}
+                for name, stats in self.stages.items()
+            }
+            return stages, dict(self.counters)
+
+    def render_prometheus(self):
+        lines = []
+        with self._lock:
+            name = f"{METRICS_PREFIX}_stage_duration_seconds"
+            lines.append(f"# HELP {name} Time spent in each request stage.")
+            lines.append(f"# TYPE {name} histogram")
+            for stage, stats in sorted(self.stages.items()):
+                cumulative = 0
+                for bound, hits in zip(DURATION_BUCKETS, stats.buckets):
+                    cumulative += hits
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {stats.count}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {stats.seconds}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {stats.count}')
+
+            name = f"{METRICS_PREFIX}_stage_max_rss_growth_bytes"
+            lines.append(f"# HELP {name} Largest resident memory growth seen during a stage.")
+            lines.append(f"# TYPE {name} gauge")
+            for stage, stats in sorted(self.stages.items()):
+                lines.append(f'{name}{{stage="{stage}"}} {stats.max_rss_growth}')
+
+            for counter, value in sorted(self.counters.items()):
+                name = f"{METRICS_PREFIX}_{counter}_total"
+                lines.append(f"# TYPE {name} counter")
+                lines.append(f"{name} {value}")
+
+        name = f"{METRICS_PREFIX}_process_resident_memory_bytes"
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {rss_bytes()}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+class Trace:
+    # Per-request aggregate of spans and counters, attached to the audit row.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.spans = {}
+        self.counters = {}
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            self.spans[stage] = self.spans.get(stage, 0.0) + seconds
+
+    def count(self, name, value):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def summary(self):
+        with self._lock:
+            return {
+                "spans_ms": {stage: round(seconds * 1000, 1) for stage, seconds in self.spans.items()},
+                "counters": dict(self.counters),
+            }
+
+
+@contextmanager
+def trace():
+    # Spans and counters recorded in this context (and in threads started with
+    # propagate()) are also collected on the yielded Trace.
+    current = Trace()
+    token = _current_trace.set(current)
+    try:
+        yield current
+    finally:
+        _current_trace.reset(token)
+
+
+def propagate(fn):
+    # Wraps fn so it runs in a copy of the caller's context, e.g. in a thread pool.
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.copy().run(fn, *args, **kwargs)
+
+
+@contextmanager
+def span(stage):
+    start_rss = rss_bytes()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        metrics.observe(stage, seconds, max(rss_bytes() - start_rss, 0))
+        current = _current_trace.get()
+        if current is not None:
+            current.observe(stage, seconds)
+
+
+def count(name, value=1):
+    metrics.count(name, value)
+    current = _current_trace.get()
+    if current is not None:
+        current.count(name, value)
+
+
+def write_prometheus(path):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(metrics.render_prometheus())
+    os.replace(tmp_path, path)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_exporter(port=None, path=None, interval=EXPORT_INTERVAL_SECONDS):
+    # Serves /metrics on `port` and/or rewrites `path` every `interval` seconds,
+    # both in daemon threads. Defaults come from NDMO_METRICS_PORT and NDMO_METRICS_FILE.
+    port = port or os.environ.get("NDMO_METRICS_PORT")
+    path = path or os.environ.get("NDMO_METRICS_FILE")
+    server = None
+    if port:
+        server = ThreadingHTTPServer(("0.0.0.0", int(port)), MetricsHandler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    if path:
+        def run():
+            while True:
+                try:
+                    write_prometheus(path)
+                except OSError:
+                    pass
+                time.sleep(interval)
+
+        threading.Thread(target=run, name="metrics-file", daemon=True).start()
+    return server
@@ -0,0 +1,10 @@
+# Runs the app modules against the local stand-ins in local_backends.py.
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# The caches read NDMO_CACHE_DIR at import time, so it is set before any app module loads.
+os.environ["NDMO_CACHE_DIR"] = tempfile.mkdtemp(prefix="ndmo-tests-")
@@ -0,0 +1,60 @@
+import json
+
+from audit_logger import AuditLogger, MemorySink
+
+
+class FlakySink(MemorySink):
+    def __init__(self):
+        super().__init__()
+        self.down = True
+
+    def write(self, rows):
+        if self.down:
+            raise ConnectionError("sink unavailable")
+        super().write(rows)
+
+
+def test_worker_survives_a_failed_journal(tmp_path):
+    # The journal's directory is a file, so journaling fails too.
+    (tmp_path / "not_a_dir").write_text("")
+    sink = FlakySink()
+    audit = AuditLogger(sink, flush_interval=0.01, max_retries=0,
+                        journal_path=str(tmp_path / "not_a_dir" / "journal.jsonl"))
+    audit.log({"request_id": 1})
+    assert audit.flush(timeout=5)
+
+    sink.down = False
+    audit.log({"request_id": 2})
+    assert audit.flush(timeout=5)
+    assert sink.rows == [{"request_id": 2}]
+    audit.close()
+
+
+def test_journaled_rows_are_replayed_once(tmp_path):
+    sink = FlakySink()
+    journal = tmp_path / "journal.jsonl"
+    audit = AuditLogger(sink, flush_interval=0.01, max_retries=0, journal_path=str(journal))
+    audit.log({"request_id": 1})
+    assert audit.flush(timeout=5)
+    # A line cut short by a crash is skipped, not fatal.
+    with open(journal, "a") as f:
+        f.write('{"request_id": \n')
+
+    sink.down = False
+    audit.log({"request_id": 2})
+    assert audit.flush(timeout=5)
+    assert sink.rows == [{"request_id": 2}, {"request_id": 1}]
+    assert not journal.exists()
+    audit.close()
+
+
+def test_close_journals_queued_rows_when_sink_is_down(tmp_path):
+    journal = tmp_path / "journal.jsonl"
+    audit = AuditLogger(FlakySink(), flush_interval=0.01, max_retries=10, journal_path=str(journal))
+    for i in range(300):
+        audit.log({"request_id": i})
+    audit.close(timeout=0.2)
+
+    journaled = sorted(json.loads(line)["request_id"] for line in journal.read_text().splitlines())
+    assert journaled == list(range(300))
+    assert audit._queue.unfinished_tasks == 0
@@ -0,0 +1,30 @@
+import clients
+from chatbot import GCP_LOCATION, GCP_PROJECT_ID, SUMMARY_MODEL, summarize_turns
+from conversation_context import ConversationContext
+from local_backends import LocalGenAIClient
+from model_gateway import MAX_CONNECTIONS
+
+SUMMARY_CONFIGS = []
+
+
+def respond(model, contents, config):
+    if model == SUMMARY_MODEL:
+        SUMMARY_CONFIGS.append(config)
+        # What a response cut off by max_output_tokens looks like.
+        return ""
+    return "reply"
+
+
+clients.shared(("genai", GCP_PROJECT_ID, GCP_LOCATION, None, MAX_CONNECTIONS), lambda: LocalGenAIClient(respond))
+
+
+def test_empty_summary_keeps_folded_turns():
+    context = ConversationContext(summarize_turns, recent_turns=2)
+    for turn in range(3):
+        context.add("user", f"question {turn} about account 4471")
+        context.add("model", f"answer {turn}")
+    context.compact(wait=True)
+
+    assert SUMMARY_CONFIGS[-1].thinking_config.thinking_budget == 0
+    assert "question 0 about account 4471" in context.summary
+    assert len(context.turns) == 2
@@ -0,0 +1,43 @@
+import pandas as pd
+import pytest
+
+import clients
+import ndmo_service as service
+from local_backends import LocalGenAIClient
+from model_gateway import MAX_CONNECTIONS
+from model_scheduler import ModelScheduler
+from ndmo_models import ClassificationMetadata
+from ndmo_rules import classify_with_rules
+
+RESPONSES = {}
+
+
+def respond(model, contents, config):
+    return RESPONSES["text"]
+
+
+clients.shared(("genai", service.GCP_PROJECT_ID, "global", None, MAX_CONNECTIONS), lambda: LocalGenAIClient(respond))
+# No quota in the way of the shards.
+clients.shared(("model_scheduler", service.GCP_PROJECT_ID, service.CLASSIFIER_MODEL),
+               lambda: ModelScheduler(rpm=10 ** 9, tpm=10 ** 12))
+
+
+@pytest.fixture
+def wide_frame():
+    # Wider than one prompt, so profile mode classifies it in column shards.
+    columns = {f"field_{index}": range(20) for index in range(service.SHARD_MAX_COLUMNS * 2 + 1)}
+    columns["national_id"] = [f"1{index:09d}" for index in range(20)]
+    return pd.DataFrame(columns)
+
+
+def test_shards_return_metadata(wide_frame):
+    RESPONSES["text"] = classify_with_rules(wide_frame)[0].model_dump_json()
+    result = service.classify_with_llm(wide_frame)
+    assert type(result) is ClassificationMetadata
+    assert result.excluded_columns == ["national_id"]
+
+
+def test_invalid_response_raises_on_the_calling_thread(wide_frame):
+    RESPONSES["text"] = '{"classification": "Secret"}'
+    with pytest.raises(service.ClassificationError, match="invalid"):
+        service.classify_with_llm(wide_frame)
@@ -0,0 +1,91 @@
+import pytest
+
+import classification_cache
+from classification_cache import ClassificationCache, cache_key
+from ndmo_models import ClassificationMetadata
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeTime()
+    monkeypatch.setattr(classification_cache.time, "time", clock)
+    return clock
+
+
+def result(label="Restricted"):
+    return ClassificationMetadata(
+        classification=label, impact_category="Individuals", impact_level="Low",
+        excluded_columns=["Email"], justification="test", ndmo_reference="test",
+    )
+
+
+def key(fingerprint, prompt_version="v1"):
+    return cache_key(fingerprint, "gemini", prompt_version)
+
+
+def disk_keys(cache):
+    return {row[0] for row in cache._db.execute("SELECT key FROM classifications")}
+
+
+def test_entries_expire_after_the_ttl(tmp_path, clock):
+    cache = ClassificationCache(str(tmp_path / "cache.sqlite"), ttl_seconds=60)
+    cache.put(key("a"), result())
+    clock.now += 60
+    assert cache.get(key("a")) == result()
+
+    clock.now += 1
+    assert cache.get(key("a")) is None
+    # Expired rows are removed from both tiers.
+    assert key("a") not in cache._memory
+    assert disk_keys(cache) == set()
+
+
+def test_memory_tier_is_bounded_and_backed_by_disk(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ClassificationCache(path, max_entries=2)
+    for name in "abc":
+        cache.put(key(name), result())
+        clock.now += 1
+    assert list(cache._memory) == [key("b"), key("c")]
+
+    # A disk hit is promoted to the memory tier, evicting the oldest entry.
+    assert cache.get(key("a")) == result()
+    assert list(cache._memory) == [key("c"), key("a")]
+    # The disk tier survives a restart.
+    assert ClassificationCache(path).get(key("b")) == result()
+
+
+def test_disk_tier_evicts_least_recently_used_rows(tmp_path, clock):
+    size = len(result().model_dump_json())
+    cache = ClassificationCache(str(tmp_path / "cache.sqlite"), max_entries=1, max_bytes=3 * size)
+    for name in "abc":
+        cache.put(key(name), result())
+        clock.now += 1
+    # Reading "a" makes "b" the least recently used row.
+    cache.get(key("a"))
+    clock.now += 1
+    cache.put(key("d"), result())
+    assert disk_keys(cache) == {key("a"), key("c"), key("d")}
+
+
+def test_invalidate_removes_one_key_or_a_whole_dataset(tmp_path, clock):
+    cache = ClassificationCache(str(tmp_path / "cache.sqlite"))
+    for k in [key("a", "v1"), key("a", "v2"), key("b")]:
+        cache.put(k, result())
+
+    cache.invalidate(key("a", "v1"))
+    assert cache.get(key("a", "v1")) is None
+    assert cache.get(key("a", "v2")) == result()
+
+    cache.invalidate_dataset("a")
+    assert cache.get(key("a", "v2")) is None
+    assert cache.get(key("b")) == result()
+    assert disk_keys(cache) == {key("b")}
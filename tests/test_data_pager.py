@@ -0,0 +1,37 @@
+import pandas as pd
+
+from data_pager import PreviewPageCache, page_count
+
+
+def frame(rows):
+    return pd.DataFrame({"id": range(rows), "city": ["Riyadh", "Jeddah", "Dammam"] * (rows // 3) + ["Tabuk"] * (rows % 3)})
+
+
+def test_pages_follow_the_view():
+    df = frame(10)
+    cache = PreviewPageCache()
+    rows, total = cache.page(df, 2, 3)
+    assert total == 10 and list(rows["id"]) == [3, 4, 5]
+
+    rows, total = cache.page(df, 1, 2, sort_by="id", ascending=False, filter_column="city", filter_text=" jed ")
+    assert total == 3 and list(rows["id"]) == [7, 4]
+    assert page_count(total, 2) == 2
+
+
+def test_identity_view_is_not_stored():
+    df = frame(1000)
+    cache = PreviewPageCache()
+    _, positions = cache.view(df)
+    assert positions == range(1000)
+    cache.page(df, 1, 25)
+    assert len(cache._views) == 0
+
+
+def test_view_cache_is_bounded_by_bytes():
+    df = frame(1000)
+    # Room for two sorted views of 8000 bytes each.
+    cache = PreviewPageCache(max_view_bytes=20_000)
+    for column in ["id", "city"]:
+        for ascending in [True, False]:
+            cache.view(df, sort_by=column, ascending=ascending)
+    assert [(key.sort_by, key.ascending) for key in cache._views] == [("city", True), ("city", False)]
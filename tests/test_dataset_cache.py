@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+from dataset_cache import DatasetCache
+from local_backends import LocalBlob, LocalStorageClient
+
+BUCKET = "ndmo-data"
+BLOB = "Bank"
+
+
+def write_blob(root, text, generation):
+    path = root / BUCKET / BLOB
+    path.write_text(text)
+    # LocalBlob uses the mtime as the generation.
+    os.utime(path, ns=(generation, generation))
+
+
+@pytest.fixture
+def bucket(tmp_path):
+    (tmp_path / BUCKET).mkdir()
+    write_blob(tmp_path, "id,name\n1,a\n2,b\n", 1_000_000_000)
+    return LocalStorageClient(str(tmp_path)).bucket(BUCKET)
+
+
+@pytest.fixture
+def downloads(monkeypatch):
+    calls = []
+    download = LocalBlob.download_as_bytes
+
+    def counted(blob):
+        calls.append(blob.name)
+        return download(blob)
+
+    monkeypatch.setattr(LocalBlob, "download_as_bytes", counted)
+    return calls
+
+
+def test_hit_reads_the_local_copy(tmp_path, bucket, downloads):
+    cache = DatasetCache(str(tmp_path / "cache"))
+    first = cache.load(bucket, BLOB)
+    second = cache.load(bucket, BLOB)
+    assert downloads == [BLOB]
+    assert second.equals(first)
+    assert second.attrs["generation"] == first.attrs["generation"] == 1_000_000_000
+
+    # A generation known up front skips the metadata call as well.
+    assert cache.load(bucket, BLOB, generation=1_000_000_000).equals(first)
+    assert downloads == [BLOB]
+
+
+def test_new_generation_invalidates(tmp_path, bucket, downloads):
+    cache = DatasetCache(str(tmp_path / "cache"))
+    first = cache.load(bucket, BLOB)
+    write_blob(tmp_path, "id,name\n1,a\n2,b\n3,c\n", 2_000_000_000)
+    second = cache.load(bucket, BLOB)
+    assert downloads == [BLOB, BLOB]
+    assert len(first) == 2 and len(second) == 3
+    assert second.attrs["generation"] == 2_000_000_000
+    assert first.attrs["fingerprint"] != second.attrs["fingerprint"]
+
+
+def test_stale_generation_is_evicted(tmp_path, bucket, downloads):
+    cache_dir = tmp_path / "cache"
+    cache = DatasetCache(str(cache_dir))
+    cache.load(bucket, BLOB)
+    write_blob(tmp_path, "id,name\n9,z\n", 2_000_000_000)
+    cache.load(bucket, BLOB)
+    assert sorted(os.listdir(cache_dir)) == [f"{BUCKET}__{BLOB}.2000000000.arrow"]
+    with pytest.raises(FileNotFoundError):
+        list(cache.iter_batches(BUCKET, BLOB, 1_000_000_000, 10))
+    assert [len(batch) for batch in cache.iter_batches(BUCKET, BLOB, 2_000_000_000, 10)] == [1]
+
+
+def test_missing_blob(tmp_path, bucket):
+    with pytest.raises(FileNotFoundError):
+        DatasetCache(str(tmp_path / "cache")).load(bucket, "Missing")
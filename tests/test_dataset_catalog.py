@@ -0,0 +1,37 @@
+import time
+
+import dataset_catalog
+from dataset_catalog import DatasetCatalog
+from local_backends import LocalStorageClient
+
+
+def make_catalog(tmp_path):
+    (tmp_path / "gcs" / "ndmo-data").mkdir(parents=True)
+    (tmp_path / "gcs" / "ndmo-data" / "Bank").write_text("id,name\n1,a\n")
+    bucket = LocalStorageClient(str(tmp_path / "gcs")).bucket("ndmo-data")
+    return DatasetCatalog(lambda: bucket, path=str(tmp_path / "catalog.json"))
+
+
+def test_requests_do_not_write_the_catalog(tmp_path):
+    catalog = make_catalog(tmp_path)
+    catalog.record_request("bank")
+    assert not (tmp_path / "catalog.json").exists()
+
+    catalog.flush()
+    assert DatasetCatalog(lambda: None, path=catalog.path).get("bank").request_count == 1
+
+
+def test_background_thread_persists_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(dataset_catalog, "SAVE_INTERVAL_SECONDS", 0.05)
+    catalog = make_catalog(tmp_path)
+    catalog.start()
+    try:
+        catalog.record_request("bank")
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            if DatasetCatalog(lambda: None, path=catalog.path).get("bank").request_count == 1:
+                break
+            time.sleep(0.05)
+        assert DatasetCatalog(lambda: None, path=catalog.path).get("bank").request_count == 1
+    finally:
+        catalog.stop()
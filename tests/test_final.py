@@ -0,0 +1,61 @@
+import os
+import time
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+import clients
+import ndmo_service as service
+from local_backends import LocalBigQueryClient, LocalStorageClient
+from synthetic_data import generate
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "final.py")
+
+
+@pytest.fixture(scope="module")
+def local_services(tmp_path_factory):
+    root = tmp_path_factory.mktemp("gcs")
+    os.makedirs(root / service.GCP_BUCKET_NAME)
+    generate("bank", 500, str(root / service.GCP_BUCKET_NAME / "Bank"), seed=0, today="2025-01-01")
+    clients.shared(("storage", service.GCP_PROJECT_ID, None), lambda: LocalStorageClient(str(root)))
+    clients.shared(("bigquery", service.GCP_PROJECT_ID, None), LocalBigQueryClient)
+    return root
+
+
+def run_query(query):
+    at = AppTest.from_file(APP, default_timeout=30).run()
+    at.text_input[0].input(query)
+    at.button[0].click().run()
+    deadline = time.monotonic() + 30
+    while not at.success and time.monotonic() < deadline:
+        time.sleep(0.2)
+        at.run()
+    return at
+
+
+@pytest.mark.parametrize("fmt", ["csv.gz", "csv", "parquet"])
+def test_download_renders_export(local_services, fmt):
+    at = run_query("Get bank data")
+    assert not at.exception
+    assert at.success, [error.value for error in at.error]
+
+    next(box for box in at.selectbox if box.label == "Export format").select(fmt)
+    next(button for button in at.button if button.label == "📦 Prepare Full Safe Dataset").click().run()
+    assert not at.exception
+    assert not at.error
+    downloads = at.get("download_button")
+    assert len(downloads) == 1
+    assert downloads[0].proto.label == "📥 Download Full Safe Dataset"
+
+
+def test_streamed_download_renders_export(local_services, monkeypatch):
+    # Every dataset counts as large, so the request takes the chunked path.
+    monkeypatch.setattr(service, "LARGE_DATASET_BYTES", 0)
+    at = run_query("Get bank data")
+    assert not at.exception
+    assert at.success, [error.value for error in at.error]
+
+    next(button for button in at.button if button.label == "📦 Prepare Full Safe Dataset").click().run()
+    assert not at.exception
+    assert not at.error
+    assert len(at.get("download_button")) == 1
@@ -0,0 +1,34 @@
+from intent_router import IntentRouter
+
+
+def test_failed_fallback_is_not_cached():
+    answers = [[], ["bank"]]
+    calls = []
+
+    def fallback(query):
+        calls.append(query)
+        return answers[len(calls) - 1]
+
+    router = IntentRouter(llm_fallback=fallback)
+    assert router.route("zzz qqq") == []
+    assert router.route("zzz qqq") == ["bank"]
+    assert calls == ["zzz qqq", "zzz qqq"]
+
+
+def test_local_matches_skip_fallback():
+    router = IntentRouter(llm_fallback=lambda query: ["hospital"])
+    assert router.route("Bank and Smart City data") == ["bank", "smart city"]
+    assert router.route("Bank and Smart City data") == ["bank", "smart city"]
+
+
+def test_unrelated_words_do_not_route():
+    router = IntentRouter()
+    for query in ["nothing", "going", "string", "pricing", "king", "thanks", "anything", "banana"]:
+        assert router.route(query) == [], query
+
+
+def test_typos_route_by_similarity():
+    router = IntentRouter(llm_fallback=lambda query: ["hospital"])
+    assert router.route("bankng") == ["bank"]
+    assert router.route("smart cty") == ["smart city"]
+    assert router.route("hospitl records and bankng") == ["hospital", "bank"]
@@ -0,0 +1,24 @@
+import time
+
+from job_queue import APPROVED, FAILED, JobQueue
+
+
+def test_finished_jobs_expire_without_new_submits():
+    queue = JobQueue(lambda job: job.finish(APPROVED, result=b"x" * 1024), workers=1, ttl=0.1)
+    queue.submit(1)
+    job = queue.wait(1, after_version=10 ** 9, timeout=5)
+    assert job.status == APPROVED and job.result
+
+    time.sleep(0.2)
+    assert queue.get(1) is None
+    assert queue.wait(1, timeout=0) is None
+
+
+def test_failing_job_reports_the_error():
+    def run(job):
+        raise RuntimeError("no data")
+
+    queue = JobQueue(run, workers=1)
+    queue.submit(1)
+    job = queue.wait(1, after_version=10 ** 9, timeout=5)
+    assert (job.status, job.message) == (FAILED, "no data")
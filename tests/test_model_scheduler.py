@@ -0,0 +1,144 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import model_scheduler
+from local_backends import LocalAPIError, LocalQuota
+from model_scheduler import BATCH, DECREASE_INTERVAL_SECONDS, INTERACTIVE, ModelScheduler, TokenBucket
+
+UNLIMITED = {"rpm": 10 ** 9, "tpm": 10 ** 12}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_refills_at_the_quota_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(60, clock=clock)
+    assert bucket.capacity == 1.0
+    assert bucket.delay(1) == 0.0
+
+    bucket.take(1)
+    assert bucket.delay(1) == pytest.approx(1.0)
+    clock.now = 0.5
+    assert bucket.delay(1) == pytest.approx(0.5)
+    # Amounts above the capacity only wait for a full bucket, then go into debt.
+    clock.now = 1.0
+    assert bucket.delay(5) == 0.0
+    bucket.take(5)
+    assert bucket.delay(1) == pytest.approx(5.0)
+    clock.now = 100.0
+    assert bucket.delay(1) == 0.0
+    bucket.drain()
+    assert bucket.delay(1) == pytest.approx(1.0)
+
+
+def test_throttling_halves_the_limit_once_per_interval():
+    clock = FakeClock()
+    scheduler = ModelScheduler(**UNLIMITED, max_concurrency=8, clock=clock)
+
+    for _ in range(3):
+        scheduler.acquire(1)
+        scheduler.release(throttled=True)
+        # Throttling empties the request bucket; let it refill within the interval.
+        clock.now += 0.001
+    assert scheduler.limit == 4.0
+
+    clock.now += DECREASE_INTERVAL_SECONDS
+    scheduler.acquire(1)
+    scheduler.release(throttled=True)
+    clock.now += 0.001
+    assert scheduler.limit == 2.0
+
+    # Additive increase: a full round of successes adds about one slot.
+    for _ in range(2):
+        scheduler.acquire(1)
+        scheduler.release()
+    assert scheduler.limit == pytest.approx(2 + 1 / 2 + 1 / 2.5)
+    assert scheduler.stats() == {"limit": scheduler.limit, "in_flight": 0, "waiting": 0}
+
+
+def test_throttling_stops_at_the_minimum():
+    clock = FakeClock()
+    scheduler = ModelScheduler(**UNLIMITED, max_concurrency=2, min_concurrency=1, clock=clock)
+    for _ in range(3):
+        scheduler.acquire(1)
+        scheduler.release(throttled=True)
+        clock.now += DECREASE_INTERVAL_SECONDS
+    assert scheduler.limit == 1.0
+
+
+def wait_for_waiters(scheduler, count):
+    deadline = time.monotonic() + 5
+    while scheduler.stats()["waiting"] < count and time.monotonic() < deadline:
+        time.sleep(0.001)
+    assert scheduler.stats()["waiting"] == count
+
+
+def test_interactive_calls_go_before_batch_calls():
+    scheduler = ModelScheduler(**UNLIMITED, max_concurrency=1)
+    order = []
+
+    def call(level, name):
+        scheduler.acquire(1, level)
+        order.append(name)
+        scheduler.release()
+
+    scheduler.acquire(1)
+    threads = []
+    for count, (level, name) in enumerate([(BATCH, "batch 1"), (BATCH, "batch 2"), (INTERACTIVE, "interactive")], 1):
+        threads.append(threading.Thread(target=call, args=(level, name)))
+        threads[-1].start()
+        wait_for_waiters(scheduler, count)
+    scheduler.release()
+    for thread in threads:
+        thread.join(5)
+    assert order == ["interactive", "batch 1", "batch 2"]
+
+
+def test_retry_after_sets_the_minimum_backoff(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(model_scheduler.time, "sleep", sleeps.append)
+    quota = LocalQuota(rpm=1)
+
+    def generate():
+        try:
+            quota.admit(1)
+        except LocalAPIError as e:
+            e.response = SimpleNamespace(headers={"retry-after": "7"})
+            raise
+        return "ok"
+
+    scheduler = ModelScheduler(**UNLIMITED, max_concurrency=8, max_retries=2)
+    assert scheduler.call(generate) == "ok"
+    with pytest.raises(LocalAPIError) as error:
+        scheduler.call(generate)
+    assert error.value.code == 429
+    assert sleeps == [7.0, 7.0]
+    assert quota.rejected == 3
+    assert scheduler.limit < 8
+    assert scheduler.stats()["in_flight"] == 0
+
+
+def test_client_errors_are_not_retried(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(model_scheduler.time, "sleep", sleeps.append)
+    calls = []
+
+    def generate():
+        calls.append(1)
+        raise LocalAPIError(400, "INVALID_ARGUMENT", "bad request")
+
+    scheduler = ModelScheduler(**UNLIMITED)
+    with pytest.raises(LocalAPIError):
+        scheduler.call(generate)
+    assert len(calls) == 1
+    assert sleeps == []
+    assert scheduler.limit == scheduler.max_concurrency
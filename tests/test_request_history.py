@@ -0,0 +1,28 @@
+import time
+
+from request_history import HistoryPage, PageCache, RequestHistoryStore
+
+
+def test_pages_are_cached_until_the_next_add(tmp_path):
+    store = RequestHistoryStore(str(tmp_path / "history.sqlite"))
+    for request_id in range(3):
+        store.add(request_id, 1, "bank", "Secret", "because", created_at=100.0 + request_id)
+
+    first = store.page(1, limit=2)
+    assert [row["request_id"] for row in first.rows] == [2, 1]
+    assert store.page(1, limit=2) is first
+    assert [row["request_id"] for row in store.page(1, before=first.next_cursor, limit=2).rows] == [0]
+
+    store.add(3, 1, "hospital", "Top Secret", "because", created_at=200.0)
+    assert [row["request_id"] for row in store.page(1, limit=2).rows] == [3, 2]
+
+
+def test_page_cache_evicts_and_expires():
+    cache = PageCache(max_pages=2, ttl_seconds=0.05)
+    pages = [HistoryPage([{"request_id": index}], None) for index in range(3)]
+    for index, page in enumerate(pages):
+        cache.put(index, page)
+    assert cache.get(0) is None
+    assert cache.get(2) is pages[2]
+    time.sleep(0.1)
+    assert cache.get(2) is None
@@ -0,0 +1,36 @@
+import os
+
+import pandas as pd
+
+from row_sampler import categorical_columns, row_tokens, sample_rows
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# About a quarter of what the whole file costs.
+BUDGET = 3000
+
+
+def test_sample_fits_the_budget_and_covers_every_stratum():
+    df = pd.read_csv(os.path.join(ROOT, "Banking_Sample_Dataset.csv"))
+    assert row_tokens(df).sum() > BUDGET
+
+    sample = sample_rows(df, BUDGET)
+    assert 0 < len(sample) < len(df)
+    assert row_tokens(sample).sum() <= BUDGET
+    assert sample.index.is_monotonic_increasing
+
+    categorical = categorical_columns(df)
+    assert "Account_Type" in categorical
+    for column in categorical:
+        assert set(sample[column].dropna()) == set(df[column].dropna()), column
+        assert sample[column].isna().any() == df[column].isna().any(), column
+    for column in df.select_dtypes(include="number").columns:
+        assert sample[column].min() == df[column].min(), column
+        assert sample[column].max() == df[column].max(), column
+
+
+def test_sample_is_deterministic():
+    df = pd.read_csv(os.path.join(ROOT, "Banking_Sample_Dataset.csv"))
+    first = sample_rows(df, BUDGET)
+    pd.testing.assert_frame_equal(sample_rows(df.copy(), BUDGET), first)
+    # Small datasets go whole.
+    assert len(sample_rows(df.head(5), BUDGET)) == 5
@@ -0,0 +1,74 @@
+import os
+
+import pandas as pd
+import pytest
+
+from ndmo_rules import (
+    GENERIC_MATCH_CONFIDENCE,
+    NAME_MATCH_CONFIDENCE,
+    RULES_CONFIDENCE_THRESHOLD,
+    classify_with_rules,
+    match_column,
+    normalize_column_name,
+)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def rule_name(column, values=("x",)):
+    rule, _ = match_column(column, pd.Series(list(values)))
+    return rule.name if rule else None
+
+
+def test_normalize_column_name():
+    assert normalize_column_name("HIV_Status") == "hiv_status"
+    assert normalize_column_name("customerId") == "customer_id"
+    assert normalize_column_name(" Date of Birth ") == "date_of_birth"
+
+
+@pytest.mark.parametrize("column, expected", [
+    ("HIV_Status", "medical"),
+    ("Blood_Type", "medical"),
+    ("Body_Temperature", "medical"),
+    ("Religion_Type", "demographic"),
+    ("Temperature_C", "municipal"),
+    ("Event_Date", "municipal"),
+    ("Prevention_Plan", None),
+    ("Home_Location", "general"),
+    ("National_ID", "national_id"),
+    ("Customer_Name", "person_name"),
+])
+def test_rule_for_column(column, expected):
+    assert rule_name(column) == expected
+
+
+def test_generic_names_defer_to_the_llm():
+    assert GENERIC_MATCH_CONFIDENCE < RULES_CONFIDENCE_THRESHOLD
+    for column in ["Home_Location", "Plan_Status", "Visit_Date", "Case_Count"]:
+        _, confidence = match_column(column, pd.Series(["x"]))
+        assert confidence == GENERIC_MATCH_CONFIDENCE
+
+
+def test_sensitive_columns_are_not_public():
+    columns = ["HIV_Status", "Blood_Type", "Religion_Type", "Body_Temperature", "Home_Location", "Prevention_Plan"]
+    result, confidence = classify_with_rules(pd.DataFrame({column: ["x", "y"] for column in columns}))
+    assert result.classification != "Public"
+    assert confidence < RULES_CONFIDENCE_THRESHOLD
+
+
+def test_identifier_values_in_unknown_columns():
+    rule, confidence = match_column("ref", pd.Series(["1234567890", "2234567890"]))
+    assert rule.name == "national_id" and rule.exclude
+    assert RULES_CONFIDENCE_THRESHOLD <= confidence < NAME_MATCH_CONFIDENCE
+
+
+@pytest.mark.parametrize("path, excluded", [
+    ("Banking_Sample_Dataset.csv", ["Customer_Name", "Account_Number", "Email", "Phone_Number"]),
+    ("Hospital.csv", ["Patient_ID", "Full_Name", "National_ID", "Date_of_Birth", "Doctor_Name", "Email"]),
+    ("Municipal_SmartCity_Sample_Dataset.csv", ["Citizen_Complaint"]),
+])
+def test_sample_datasets_are_classified_locally(path, excluded):
+    result, confidence = classify_with_rules(pd.read_csv(os.path.join(ROOT, path)))
+    assert confidence >= RULES_CONFIDENCE_THRESHOLD
+    assert result.classification == "Restricted"
+    assert result.excluded_columns == excluded
@@ -0,0 +1,110 @@
+import threading
+import time
+
+import pytest
+
+import singleflight
+from singleflight import SingleFlight
+
+WAITERS = 4
+
+
+class Stopped(BaseException):
+    # Stands in for the exception Streamlit raises to stop a script thread.
+    pass
+
+
+def run_together(monkeypatch, flight, fn, callers):
+    # Starts the callers behind a barrier and returns once all but the leader
+    # are waiting on its call, so fn can finish without any caller missing it.
+    shared = []
+    monkeypatch.setattr(singleflight.telemetry, "count", lambda name, value=1: shared.append(name))
+    barrier = threading.Barrier(callers)
+    outcomes = [None] * callers
+
+    def call(i):
+        barrier.wait()
+        try:
+            outcomes[i] = ("ok", flight.do("key", fn))
+        except BaseException as e:
+            outcomes[i] = ("error", e)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(callers)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while len(shared) < callers - 1 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    return threads, outcomes
+
+
+def test_concurrent_calls_share_one_run(monkeypatch):
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        return "result"
+
+    threads, outcomes = run_together(monkeypatch, flight, fn, WAITERS + 1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert len(calls) == 1
+    assert outcomes == [("ok", "result")] * (WAITERS + 1)
+    assert flight.in_flight() == 0
+
+
+def test_error_reaches_every_waiter(monkeypatch):
+    flight = SingleFlight()
+    release = threading.Event()
+    error = ValueError("load failed")
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        raise error
+
+    threads, outcomes = run_together(monkeypatch, flight, fn, WAITERS + 1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert len(calls) == 1
+    assert outcomes == [("error", error)] * (WAITERS + 1)
+    assert flight.in_flight() == 0
+
+
+def test_waiters_retry_when_the_leader_is_stopped(monkeypatch):
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if len(calls) == 1:
+            release.wait(5)
+            raise Stopped()
+        return "result"
+
+    threads, outcomes = run_together(monkeypatch, flight, fn, 2)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    # The stopped leader sees its own exception; the waiter runs fn again.
+    assert len(calls) == 2
+    assert sorted(kind for kind, _ in outcomes) == ["error", "ok"]
+    assert ("ok", "result") in outcomes
+    assert any(isinstance(value, Stopped) for _, value in outcomes)
+    assert flight.in_flight() == 0
+
+
+def test_sequential_calls_are_not_remembered():
+    flight = SingleFlight()
+    assert flight.do("key", lambda: 1) == 1
+    assert flight.do("key", lambda: 2) == 2
+    with pytest.raises(ValueError):
+        flight.do("key", lambda: int("x"))
+    assert flight.in_flight() == 0
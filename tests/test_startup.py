@@ -0,0 +1,13 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from startup_time import DEFERRED_MODULES, import_times
+
+
+def test_service_import_defers_sdks_and_ui():
+    imported = {name for name, _, _, _ in import_times(["ndmo_service"])}
+    assert "ndmo_service" in imported
+    for module in [*DEFERRED_MODULES, "streamlit"]:
+        assert module not in imported, module